@@ -0,0 +1,92 @@
+"""
+
+Módulo Catalog
+
+        Dicionários em memória com os catálogos entidade_bh e atributo_bh, indexados por entidade
+
+"""
+
+
+# Bibliotecas
+import pandas as pd
+import pandas.io.sql as sqlio
+import Database.Queries as Queries
+
+
+entities_query = "select * from entidade_bh"
+attributes_query = "select * from atributo_bh"
+
+
+def _strip(value):
+    return '' if pd.isna(value) else str(value).strip()
+
+
+# Catálogo de entidades e atributos
+class Catalog:
+
+    def __init__(self, entities: pd.DataFrame, attributes: pd.DataFrame):
+
+        self.entities = entities
+        self.attributes = attributes
+
+        # Descrição (template) de cada entidade, pelo nome em entidade_bh
+        self.templates = {_strip(k): _strip(j) for k, j in zip(entities['nome'], entities['descr'])}
+
+        # Entidade da base e tipo (histórica ou não) de cada nome em entidade_bh
+        kind = {}
+
+        for nome, entbd, esqgrv in zip(entities['nome'], entities['entbd'], entities['esqgrv']):
+            if not (pd.isna(entbd) or pd.isna(esqgrv)):
+                kind[_strip(nome)] = (_strip(entbd), _strip(esqgrv) != '')
+
+        static = {}
+        historied = {}
+
+        for i, ent in enumerate(attributes['ent']):
+
+            k = kind.get(_strip(ent))
+
+            if k is None:
+                continue
+
+            index = historied if k[1] else static
+            index.setdefault(k[0], []).append(i)
+
+        # Atributos mantêm a ordem da tabela, da qual depende a lista das abas
+        self.static = {k: attributes.iloc[j].reset_index(drop=True) for k, j in static.items()}
+        self.historied = {k: attributes.iloc[j].reset_index(drop=True) for k, j in historied.items()}
+
+        self.empty = attributes.iloc[0:0]
+
+    # Carrega os catálogos da base
+    @classmethod
+    def load(cls, conn):
+        return cls(sqlio.read_sql_query(entities_query, conn), sqlio.read_sql_query(attributes_query, conn))
+
+    # Descrição do modelo da entidade
+    def template(self, entity):
+        return self.templates.get(_strip(entity) + '_r')
+
+    # Verdadeiro se a entidade tem tabela _r (registrada em entidade_bh)
+    def has_reference(self, entity):
+        return (_strip(entity) + '_r') in self.templates
+
+    # Atributos estáticos (esqgrv vazio) da entidade
+    def static_attributes(self, entity):
+        return self.static.get(_strip(entity), self.empty)
+
+    # Atributos históricos (esqgrv preenchido) da entidade
+    def historied_attributes(self, entity):
+        return self.historied.get(_strip(entity), self.empty)
+
+    # Nomes dos atributos históricos da entidade na tabela _h (já com as trocas de nome)
+    def history_names(self, entity):
+        return {Queries.history_name(_strip(k)) for k in self.historied_attributes(entity)['atrbd']}
+
+    # Informações usadas pelas abas ao selecionar um item
+    def selection(self, entity):
+        return {
+            'template': self.template(entity),
+            'static': self.static_attributes(entity),
+            'historied': self.historied_attributes(entity)
+        }
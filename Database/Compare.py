@@ -0,0 +1,52 @@
+"""
+
+Módulo Compare
+
+        Histórico de vários itens com uma consulta por entidade, alinhado em uma tabela larga (item × atributo)
+
+"""
+
+
+# Bibliotecas
+import pandas as pd
+import Database.Prepared as Prepared
+
+
+# Uma linha por instante e uma coluna "identificador atributo" por item e atributo
+# labels: identificador de cada bh_chave
+def pivot(long: pd.DataFrame, labels: dict):
+
+    values = [k for k in long.columns if k not in ('bh_chave', 'tempo')]
+    labels = {str(k): v for k, v in labels.items()}
+
+    # Instantes repetidos de um mesmo item ficam com o último valor
+    long = long.drop_duplicates(['tempo', 'bh_chave'], keep='last')
+
+    wide = long.pivot(index='tempo', columns='bh_chave', values=values)
+    wide.columns = [f'{labels.get(str(key), key)} {att}' for att, key in wide.columns]
+
+    return wide
+
+
+# Junta as tabelas das entidades pelo tempo
+# asof: cada coluna fica com o último valor conhecido em cada instante da linha do tempo comum
+def join(tables, asof=True):
+
+    tables = [k for k in tables if not k.empty]
+
+    if len(tables) == 0:
+        return pd.DataFrame()
+
+    wide = pd.concat(tables, axis=1, sort=True)
+
+    if asof:
+        wide = wide.ffill()
+
+    return wide.rename_axis('tempo').reset_index()
+
+
+# Executa as consultas (uma por entidade) e monta a tabela larga (executada fora da thread principal)
+# requests: lista de (consulta, parâmetros, identificadores por bh_chave)
+def collect(conn, requests, asof=True):
+    return join([pivot(Prepared.read(conn, query, params), labels)
+                 for query, params, labels in requests], asof)
@@ -0,0 +1,96 @@
+"""
+
+Módulo Connect
+
+        Configuração de conexão salva (config.json), túnel SSH e pool de conexões com a base do SAGE
+
+"""
+
+
+# Bibliotecas
+import os
+import json
+import Database.Pool as Pool
+
+
+# Pasta e arquivo da configuração
+save_path = os.getenv('LOCALAPPDATA', '') + '\\SAGE TreeView\\config'
+config_file = save_path + '\\config.json'
+
+# Base de dados do SAGE
+database = 'bhdemo_ems_sage'
+
+# Valores das opções que não existiam nas primeiras versões do arquivo
+defaults = {
+    'hierarchy': True,
+    'prefetch_depth': 1,
+    'statement_timeout': 300,
+    'pool_size': 4,
+    'pool_idle_timeout': 300,
+    'pool_warm_up': 2
+}
+
+
+# Falha ao abrir o túnel SSH
+class TunnelError(Exception):
+    pass
+
+
+# Lê a configuração salva (FileNotFoundError se ela ainda não existe)
+def load(name=config_file):
+
+    with open(name, 'r') as file:
+        config = json.load(file)
+
+    return dict(defaults, **config)
+
+
+# Grava a configuração
+def save(config, name=config_file):
+
+    with open(name, 'w+') as file:
+        json.dump(config, file, indent=4)
+
+
+# Abre o túnel SSH até a base
+# sshtunnel (e o paramiko) só é carregado aqui, fora da abertura do programa
+def tunnel(config):
+
+    from sshtunnel import SSHTunnelForwarder, BaseSSHTunnelForwarderError
+
+    forwarder = SSHTunnelForwarder(
+            (config['remote_address'], int(config['remote_port'])),
+            ssh_username=config['user'],
+            remote_bind_address=(config['local_address'], int(config['local_port'])),
+            local_bind_address=('localhost', int(config['intermediate_port'])),
+            ssh_pkey=config['file'],
+            ssh_private_key_password=config['password']
+    )
+
+    try:
+        forwarder.start()
+    except BaseSSHTunnelForwarderError as error:
+        raise TunnelError(str(error)) from error
+
+    return forwarder
+
+
+# Pool de conexões através do túnel; size e timeout substituem os valores da configuração
+# timeout = 0 desativa o limite de tempo das consultas; a espera por uma conexão livre cresce com ele
+def pool(config, size=None, timeout=None):
+
+    size = config['pool_size'] if size is None else size
+    timeout = config['statement_timeout'] if timeout is None else timeout
+
+    return Pool.ConnectionPool(
+            size=size,
+            idle_timeout=config['pool_idle_timeout'],
+            warm_up=min(config['pool_warm_up'], size),
+            wait=Pool.wait_timeout + timeout,
+            dbname=database,
+            user='sage',
+            password='sage',
+            host='localhost',
+            port=int(config['intermediate_port']),
+            options=f"-c statement_timeout={timeout * 1000}"
+    )
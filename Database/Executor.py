@@ -0,0 +1,272 @@
+"""
+
+Módulo Executor
+
+        Executa as consultas em threads de trabalho, entregando os resultados à janela por sinais
+
+"""
+
+
+# Bibliotecas
+import os
+import gzip
+import time
+import threading
+import psycopg2
+import pandas as pd
+import Database.Prepared as Prepared
+from PyQt5 import QtCore
+
+
+# Interrupção pedida pelo usuário, lançada no próximo aviso de progresso
+class Cancelled(Exception):
+    pass
+
+
+# Consulta simples, executada na thread de trabalho como comando preparado
+def read_sql(conn, query, params=None):
+    return Prepared.read(conn, query, params)
+
+
+# Consulta lida aos poucos por um cursor no servidor; cada bloco é entregue por progress
+# Retorna o número de linhas lidas
+def stream_sql(conn, query, params=None, chunk=20000, limit=None, progress=None):
+
+    rows = 0
+
+    # Cursores no servidor exigem uma transação
+    conn.autocommit = False
+
+    try:
+
+        with conn.cursor(name='stream') as cursor:
+
+            cursor.itersize = chunk
+            cursor.execute(query, params)
+
+            while (limit is None) or (rows < limit):
+
+                size = chunk if limit is None else min(chunk, limit - rows)
+                data = cursor.fetchmany(size)
+
+                if len(data) == 0:
+                    break
+
+                rows += len(data)
+                progress(pd.DataFrame.from_records(data, columns=[k[0] for k in cursor.description]))
+
+    finally:
+        conn.rollback()
+        conn.autocommit = True
+
+    return rows
+
+
+# Arquivo de destino do COPY que conta bytes e linhas e avisa o progresso a cada interval segundos
+class _CountingFile:
+
+    def __init__(self, file, progress, interval=0.25):
+
+        self.file = file
+        self.progress = progress
+        self.interval = interval
+
+        self.bytes = 0
+        self.rows = 0
+        self.last = time.monotonic()
+
+    def write(self, data):
+
+        self.file.write(data)
+
+        self.bytes += len(data)
+        self.rows += data.count(b'\n') if isinstance(data, bytes) else data.count('\n')
+
+        if (self.progress is not None) and (time.monotonic() - self.last >= self.interval):
+            self.last = time.monotonic()
+            self.progress((self.bytes, self.rows))
+
+
+# Grava o resultado da consulta direto no arquivo com COPY ... TO STDOUT, sem passar pelo pandas
+# Arquivos terminados em .gz são comprimidos; progress recebe (bytes, linhas) e o retorno é o mesmo par no final
+def copy_sql(conn, query, params, filename, progress=None):
+
+    temp = filename + '.tmp'
+    opener = gzip.open if filename.lower().endswith('.gz') else open
+
+    try:
+
+        with conn.cursor() as cursor:
+
+            query = cursor.mogrify(query, params).decode(psycopg2.extensions.encodings[conn.encoding])
+
+            with opener(temp, 'wb') as file:
+
+                counter = _CountingFile(file, progress)
+                cursor.copy_expert(f"copy ({query}) to stdout with (format csv, header true, delimiter ';')", counter)
+
+        os.replace(temp, filename)
+
+    except BaseException:
+
+        # Um COPY interrompido deixa a conexão em estado incerto; ela é fechada e o pool a descarta
+        conn.close()
+        raise
+
+    finally:
+        if os.path.exists(temp):
+            os.remove(temp)
+
+    return counter.bytes, counter.rows - 1
+
+
+# Sinais de uma tarefa (vivem na thread principal)
+class TaskSignals(QtCore.QObject):
+
+    result = QtCore.pyqtSignal(object)
+    error = QtCore.pyqtSignal(object)
+    progress = QtCore.pyqtSignal(object)
+    finished = QtCore.pyqtSignal()
+
+
+# Tarefa: function(conn, *args) executada no QThreadPool com uma conexão própria do pool
+# Sem conexão (connection=False), executa apenas function(*args)
+class Task(QtCore.QRunnable):
+
+    def __init__(self, executor, function, args, cancellable=True, progress=False, connection=True):
+        super().__init__()
+        self.setAutoDelete(False)
+
+        self.executor = executor
+        self.function = function
+        self.args = args
+        self.cancellable = cancellable
+        self.report_progress = progress
+        self.use_connection = connection
+
+        self.signals = TaskSignals()
+        self.cancelled = False
+
+        # Conexão em uso; o lock garante que cancel só interrompe a consulta enquanto a conexão é desta tarefa
+        self.conn = None
+        self.lock = threading.Lock()
+
+    def run(self):
+
+        try:
+
+            if self.cancelled:
+                return
+
+            kwargs = {'progress': self.progress} if self.report_progress else {}
+
+            if not self.use_connection:
+                value = self.function(*self.args, **kwargs)
+
+            else:
+                with self.executor.source().connection() as conn:
+
+                    with self.lock:
+
+                        if self.cancelled:
+                            return
+
+                        self.conn = conn
+
+                    try:
+                        value = self.function(conn, *self.args, **kwargs)
+                    finally:
+                        with self.lock:
+                            self.conn = None
+
+        # Qualquer erro é entregue à thread principal, que decide o que fazer
+        except Exception as error:
+            if not self.cancelled:
+                self.signals.error.emit(error)
+
+        else:
+            if not self.cancelled:
+                self.signals.result.emit(value)
+
+        finally:
+            self.signals.finished.emit()
+
+    # Entrega um resultado parcial, interrompendo a tarefa se ela foi cancelada
+    def progress(self, value):
+
+        if self.cancelled:
+            raise Cancelled
+
+        self.signals.progress.emit(value)
+
+    # Cancela a tarefa, interrompendo a consulta no servidor se já estiver em andamento
+    def cancel(self):
+
+        with self.lock:
+
+            self.cancelled = True
+
+            if self.conn is not None:
+                try:
+                    self.conn.cancel()
+                except psycopg2.Error:
+                    pass
+
+
+# Fila de consultas
+class Executor(QtCore.QObject):
+
+    # Número de consultas canceláveis em andamento
+    changed = QtCore.pyqtSignal(int)
+
+    # source: função que retorna o pool de conexões atual
+    def __init__(self, source, threads=4):
+        super().__init__()
+
+        self.source = source
+        self.tasks = set()
+
+        self.threads = QtCore.QThreadPool()
+        self.threads.setMaxThreadCount(threads)
+
+    # Agenda function(conn, *args); result, error e finished são chamados na thread principal
+    # Os sinais são ligados antes de a tarefa começar: uma tarefa rápida não termina antes de alguém ouvi-la
+    def submit(self, function, *args, result=None, error=None, progress=None, finished=None, cancellable=True, connection=True):
+
+        task = Task(self, function, args, cancellable, progress is not None, connection)
+
+        if result is not None:
+            task.signals.result.connect(result)
+
+        if error is not None:
+            task.signals.error.connect(error)
+
+        if progress is not None:
+            task.signals.progress.connect(progress)
+
+        if finished is not None:
+            task.signals.finished.connect(finished)
+
+        task.signals.finished.connect(lambda: self._finished(task))
+
+        self.tasks.add(task)
+        self.changed.emit(self.running)
+
+        self.threads.start(task)
+
+        return task
+
+    def _finished(self, task):
+        self.tasks.discard(task)
+        self.changed.emit(self.running)
+
+    # Número de consultas canceláveis em andamento
+    @property
+    def running(self):
+        return len([k for k in self.tasks if k.cancellable])
+
+    # Cancela todas as consultas canceláveis
+    def cancel_all(self):
+        for task in list(self.tasks):
+            if task.cancellable:
+                task.cancel()
@@ -0,0 +1,135 @@
+"""
+
+Módulo Pages
+
+        Consultas paginadas por chave (bh_dthr seguido de colunas de desempate): cada página continua a partir
+        da última linha da anterior, sem OFFSET, de modo que o custo de uma página não depende da sua posição
+
+        Nas tabelas _h, bh_dthr e bh_chave identificam cada linha (um valor por item e instante). Em eve_h
+        o desempate é mrid, que não basta: eventos do mesmo item no mesmo instante têm a mesma chave e
+        eve_h não tem uma coluna de sequência que os diferencie. Com ties, uma página cheia é completada
+        com todas as linhas empatadas com a sua última chave, de modo que nenhuma fica entre duas páginas
+
+"""
+
+
+# Bibliotecas
+import pandas as pd
+import Database.Queries as Queries
+import Database.Prepared as Prepared
+
+
+# Colunas da chave acrescentadas a cada página e retiradas antes de mostrá-la
+time_column = '_page_time'
+key_column = '_page_key{0}'
+
+
+# Consulta paginada de uma tabela histórica (_h ou eve_h)
+class Pager:
+
+    # columns: colunas mostradas; where: filtro com parâmetros nomeados (params)
+    # keys: colunas de desempate depois de bh_dthr (bh_chave nas tabelas _h, mrid em eve_h)
+    # constants: colunas com valor fixo acrescentadas a cada página
+    # resolve(conn, params): completa os parâmetros na primeira página (por exemplo, com os descendentes de um item)
+    # ties: a chave pode se repetir (eve_h); cada página termina no fim de um grupo de linhas com a mesma chave
+    def __init__(self, columns, table, where, params, page=5000, pages=8, constants=None, resolve=None, keys=('bh_chave',), ties=False):
+
+        self.columns = columns
+        self.table = table
+        self.where = where
+        self.params = params
+        self.page = page
+        self.pages = pages
+        self.constants = constants or {}
+        self.resolve = resolve
+        self.keys = Queries.names(keys)
+        self.ties = ties
+
+        self.key_columns = [time_column] + [key_column.format(i) for i in range(len(self.keys))]
+
+    def _read(self, conn, condition, params, descending=False):
+
+        if self.resolve is not None:
+            self.params = self.resolve(conn, self.params)
+            self.resolve = None
+
+        order = ', '.join(f"{k} {'desc' if descending else 'asc'}" for k in ['bh_dthr'] + self.keys)
+
+        query = f"{self._select()} where ({self.where}) and ({condition}) order by {order} limit {int(self.page)}"
+
+        g = Prepared.read(conn, query, dict(self.params, **params))
+
+        if self.ties and (len(g) >= self.page):
+            g = self._complete(conn, g)
+
+        if descending:
+            g = g.iloc[::-1].reset_index(drop=True)
+
+        return self._split(g)
+
+    def _select(self):
+
+        keys = ', '.join(f'{k} as {key_column.format(i)}' for i, k in enumerate(self.keys))
+
+        return f"select {self.columns}, bh_dthr as {time_column}, {keys} from {self.table}"
+
+    # Troca as últimas linhas da página (na ordem da consulta) por todas as linhas com a mesma chave
+    # Sem isso, as empatadas que ficaram além do limite seriam puladas pela comparação estrita da página seguinte
+    def _complete(self, conn, g):
+
+        last = tuple(g[k].iloc[-1] for k in self.key_columns)
+        tied = (g[self.key_columns] == pd.Series(last, index=self.key_columns)).all(axis=1)
+
+        condition, params = self._compare('=', last)
+        query = f"{self._select()} where ({self.where}) and ({condition})"
+
+        group = Prepared.read(conn, query, dict(self.params, **params))
+
+        return pd.concat([g[~tied], group], ignore_index=True)
+
+    # Separa a página das chaves da primeira e da última linha
+    def _split(self, g):
+
+        if len(g) == 0:
+            first = last = None
+        else:
+            first = tuple(g[k].iloc[0] for k in self.key_columns)
+            last = tuple(g[k].iloc[-1] for k in self.key_columns)
+
+        data = g.drop(columns=self.key_columns)
+
+        if self.constants:
+            data = data.assign(**self.constants)
+
+        return data, first, last
+
+    # Comparação da chave de uma linha com a chave dada, como linha do PostgreSQL: (bh_dthr, ...) > (...)
+    def _compare(self, operator, key):
+
+        names = [f'page_key{i}' for i in range(len(self.keys))]
+
+        condition = (
+            f"(bh_dthr, {', '.join(self.keys)}) {operator} "
+            f"(%(page_time)s, {', '.join(f'%({k})s' for k in names)})"
+        )
+
+        params = {'page_time': str(pd.Timestamp(key[0]))}
+        params.update({k: Queries.plain(v) for k, v in zip(names, key[1:])})
+
+        return condition, params
+
+    # Página a partir de um instante (ou do início do intervalo)
+    def at(self, conn, timestamp=None):
+
+        if timestamp is None:
+            return self._read(conn, 'true', {})
+
+        return self._read(conn, 'bh_dthr >= %(page_time)s', {'page_time': str(timestamp)})
+
+    # Página seguinte a uma chave
+    def after(self, conn, key):
+        return self._read(conn, *self._compare('>', key))
+
+    # Página anterior a uma chave
+    def before(self, conn, key):
+        return self._read(conn, *self._compare('<', key), descending=True)
@@ -0,0 +1,205 @@
+"""
+
+Módulo Pool
+
+        Conjunto de conexões com a base, compartilhado entre as threads através do túnel SSH
+
+"""
+
+
+# Bibliotecas
+import time
+import threading
+import contextlib
+import psycopg2
+
+
+# Conexões paradas há mais tempo que isso são testadas antes de voltar ao uso
+ping_interval = 30
+
+# Espera máxima, em segundos, por uma conexão livre; depois dela getconn lança PoolError em vez de travar
+wait_timeout = 120
+
+
+# Erro ao obter uma conexão do pool
+class PoolError(psycopg2.OperationalError):
+    pass
+
+
+# Pool de conexões seguro entre threads
+class ConnectionPool:
+
+    def __init__(self, size=4, idle_timeout=300, warm_up=1, wait=wait_timeout, **kwargs):
+
+        self.size = max(size, 1)
+        self.wait = wait
+        self.idle_timeout = idle_timeout
+        self.warm_up = min(warm_up, self.size)
+        self.kwargs = kwargs
+
+        self.lock = threading.Condition()
+        self.idle = []
+        self.used = set()
+        self.opening = 0
+        self.closed = False
+
+        for _ in range(self.warm_up):
+            self.idle.append((self._new(), time.monotonic()))
+
+    # Abre uma nova conexão
+    def _new(self):
+
+        conn = psycopg2.connect(**self.kwargs)
+
+        # Somente leitura: um erro ou cancelamento não deixa a transação abortada
+        conn.autocommit = True
+
+        return conn
+
+    # Verifica se uma conexão está utilizável
+    @staticmethod
+    def healthy(conn, ping=False):
+
+        if conn.closed != 0:
+            return False
+
+        if ping:
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute('select 1')
+            except psycopg2.Error:
+                return False
+
+        return True
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    # Fecha as conexões ociosas há mais tempo que idle_timeout, mantendo warm_up abertas
+    def _expire(self):
+
+        if self.idle_timeout <= 0:
+            return
+
+        now = time.monotonic()
+        keep = []
+
+        for conn, last in sorted(self.idle, key=lambda x: x[1], reverse=True):
+            if (now - last > self.idle_timeout) and (len(keep) + len(self.used) >= self.warm_up):
+                self._close(conn)
+            else:
+                keep.append((conn, last))
+
+        self.idle = keep[::-1]
+
+    # Obtém uma conexão, esperando até timeout segundos (wait, se omitido) se todas estiverem em uso
+    def getconn(self, timeout=None):
+
+        if timeout is None:
+            timeout = self.wait
+
+        deadline = time.monotonic() + timeout
+
+        with self.lock:
+
+            while True:
+
+                if self.closed:
+                    raise PoolError('O pool de conexões foi fechado')
+
+                self._expire()
+
+                while self.idle:
+
+                    conn, last = self.idle.pop()
+
+                    if self.healthy(conn, ping=time.monotonic() - last > ping_interval):
+                        self.used.add(conn)
+                        return conn
+
+                    self._close(conn)
+
+                if len(self.used) + self.opening < self.size:
+                    self.opening += 1
+                    break
+
+                remaining = deadline - time.monotonic()
+
+                if (remaining <= 0) or not self.lock.wait(remaining):
+                    raise PoolError('Todas as conexões estão em uso')
+
+        # A conexão é aberta fora do lock para não bloquear as outras threads
+        try:
+            conn = self._new()
+        except psycopg2.Error:
+            with self.lock:
+                self.opening -= 1
+                self.lock.notify()
+            raise
+
+        with self.lock:
+            self.opening -= 1
+            self.used.add(conn)
+
+        return conn
+
+    # Devolve uma conexão ao pool
+    def putconn(self, conn):
+
+        with self.lock:
+
+            self.used.discard(conn)
+
+            if self.closed or not self.healthy(conn):
+                self._close(conn)
+            else:
+                self.idle.append((conn, time.monotonic()))
+
+            self.lock.notify()
+
+    # Uso: with pool.connection() as conn
+    @contextlib.contextmanager
+    def connection(self, timeout=None):
+
+        conn = self.getconn(timeout)
+
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    # Verifica o pool, testando uma conexão na base quando ping=True
+    def check(self, ping=False):
+
+        if self.closed:
+            return False
+
+        if not ping:
+            return True
+
+        try:
+            with self.connection(timeout=5) as conn:
+                return self.healthy(conn, ping=True)
+        except psycopg2.Error:
+            return False
+
+    # Fecha todas as conexões
+    def close(self):
+
+        with self.lock:
+
+            self.closed = True
+
+            for conn, _ in self.idle:
+                self._close(conn)
+
+            for conn in self.used:
+                self._close(conn)
+
+            self.idle = []
+            self.used = set()
+            self.lock.notify_all()
@@ -0,0 +1,133 @@
+"""
+
+Módulo Prepared
+
+        Consultas executadas como comandos preparados (PREPARE/EXECUTE), guardados em cada conexão:
+        uma consulta repetida com outros valores não é analisada nem planejada de novo pelo servidor
+
+"""
+
+
+# Bibliotecas
+import re
+import itertools
+import threading
+import weakref
+from collections import OrderedDict
+import psycopg2
+import psycopg2.errors
+import pandas as pd
+import pandas.io.sql as sqlio
+
+
+# Comandos preparados mantidos por conexão; os usados há mais tempo são descartados (DEALLOCATE)
+statement_limit = 128
+
+# Parâmetros nomeados no formato do psycopg2
+parameter = re.compile(r'%\((\w+)\)s')
+
+# Comandos de cada conexão: {conexão: OrderedDict(consulta: (nome, parâmetros))}
+_statements = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+_names = itertools.count()
+
+
+# Troca os parâmetros nomeados por $1, $2, ... (um número por nome, na ordem em que aparecem)
+def positional(query):
+
+    names = []
+
+    def number(match):
+
+        if match.group(1) not in names:
+            names.append(match.group(1))
+
+        return f'${names.index(match.group(1)) + 1}'
+
+    return parameter.sub(number, query).replace('%%', '%'), names
+
+
+# Comandos já preparados na conexão
+def _prepared(conn):
+    with _lock:
+        return _statements.setdefault(conn, OrderedDict())
+
+
+# Nome do comando preparado da consulta, preparando-a na primeira vez
+def _statement(conn, cursor, query):
+
+    statements = _prepared(conn)
+    statement = statements.get(query)
+
+    if statement is not None:
+        statements.move_to_end(query)
+        return statement
+
+    text, names = positional(query)
+    name = f'sage_{next(_names)}'
+
+    cursor.execute(f'prepare {name} as {text}')
+    statement = statements[query] = (name, names)
+
+    while len(statements) > statement_limit:
+        _, (old, _) = statements.popitem(last=False)
+        cursor.execute(f'deallocate {old}')
+
+    return statement
+
+
+# Esquece os comandos da conexão (por exemplo, depois de um DISCARD ou de uma reconexão no servidor)
+def forget(conn):
+    with _lock:
+        _statements.pop(conn, None)
+
+
+def _execute(conn, cursor, query, params):
+
+    name, names = _statement(conn, cursor, query)
+    values = [params[k] for k in names]
+
+    cursor.execute(f"execute {name} ({', '.join(['%s'] * len(values))})" if values else f'execute {name}', values)
+
+
+# Verdadeiro se o erro (ou o erro que o causou, como no DatabaseError do pandas) é o tempo limite da consulta
+def timed_out(error):
+
+    while error is not None:
+
+        if isinstance(error, psycopg2.errors.QueryCanceled):
+            return True
+
+        error = error.__cause__ or error.__context__
+
+    return False
+
+
+# Executa a consulta com os parâmetros nomeados e retorna a tabela, como read_sql_query
+# Erros de conexão e de tempo limite chegam sem alteração; os demais, como DatabaseError do pandas
+def read(conn, query, params=None):
+
+    params = params or {}
+
+    try:
+
+        with conn.cursor() as cursor:
+
+            try:
+                _execute(conn, cursor, query, params)
+
+            # O servidor não tem mais o comando: é preparado de novo uma vez
+            except psycopg2.errors.InvalidSqlStatementName:
+                forget(conn)
+                _execute(conn, cursor, query, params)
+
+            columns = [k[0] for k in cursor.description]
+            data = cursor.fetchall()
+
+    except psycopg2.OperationalError:
+        raise
+
+    except psycopg2.Error as error:
+        raise sqlio.DatabaseError(f"Execution failed on sql '{query}': {error}") from error
+
+    return pd.DataFrame.from_records(data, columns=columns, coerce_float=True)
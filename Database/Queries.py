@@ -0,0 +1,220 @@
+"""
+
+Módulo Queries
+
+        Consultas das abas Consulta, Filme e Alarmes, montadas sem depender da interface
+        (usadas pela janela principal e pelo modo em lote)
+
+        Entidades, atributos e colunas entram no texto da consulta e são validados como nomes;
+        os valores (chaves, datas, listas) vão sempre como parâmetros, de modo que o texto de uma consulta
+        depende apenas da entidade e dos atributos e o comando preparado pode ser reaproveitado (módulo Prepared)
+
+"""
+
+
+# Bibliotecas
+import re
+import math
+import pandas as pd
+
+
+# Diferença, em horas, entre o horário gravado na base e o horário local
+utc_offset = 3
+
+# Atributos cujo nome na tabela histórica difere do nome em atributo_bh
+attribute_names = {
+    'a1_flags': 'flag',
+    'a2_flags': 'flagest',
+    'estad': 'estado',
+    'Isupa': 'Isa'
+}
+
+# Agregações do Filme por intervalo; last escolhe o valor com a maior marca de tempo
+aggregates = {
+    'min': 'min({0})',
+    'max': 'max({0})',
+    'avg': 'avg({0})',
+    'last': 'last({0}, bh_dthr)'
+}
+
+# Preenchimento dos intervalos sem dados, na ordem da lista da aba Filme
+gapfills = ['', 'interpolate', 'locf']
+
+# Severidades dos alarmes, pelo nome mostrado na aba Alarmes
+severities = {
+    'Advertência': 'K_SEV_ADVER',
+    'Fatal': 'K_SEV_FATAL',
+    'Normal': 'K_SEV_NORML',
+    'Pânico': 'K_SEV_PANIC',
+    'Nula': 'K_SEV_SNULA',
+    'Urgência': 'K_SEV_URGEN'
+}
+
+
+# Modelo de uma entidade (nome da tabela _r em entidade_bh)
+template_query = "select * from entidade_bh where nome = %(entity)s"
+
+# Atributos estáticos e históricos de uma entidade
+static_query = "select * from atributo_bh where ent in (select nome from entidade_bh where entbd = %(entity)s and esqgrv = '')"
+historied_query = "select * from atributo_bh where ent in (select nome from entidade_bh where entbd = %(entity)s and esqgrv <> '')"
+
+# Nomes aceitos para entidades, atributos e colunas
+identifier = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+
+
+# Nome de um atributo na tabela histórica
+def history_name(attribute):
+    return attribute_names.get(attribute, attribute)
+
+
+# Nome de entidade, atributo ou coluna sem espaços; ValueError se não for um identificador simples
+def name(value):
+
+    value = str(value).strip()
+
+    if not identifier.fullmatch(value):
+        raise ValueError(f'Nome inválido na consulta: {value!r}')
+
+    return value
+
+
+def names(values):
+    return [name(k) for k in values]
+
+
+# Entidade e atributos históricos conferidos com o catálogo atributo_bh (apenas os nomes, sem o catálogo)
+# ValueError se a entidade não tiver algum dos atributos
+def validate(entity, attributes, catalog=None):
+
+    entity = name(entity)
+    attributes = names(attributes)
+
+    if catalog is not None:
+
+        known = catalog.history_names(entity)
+        unknown = [k for k in attributes if k not in known]
+
+        if unknown:
+            raise ValueError(f"Atributos que a entidade {entity} não possui: {', '.join(unknown)}")
+
+    return entity, attributes
+
+
+# Valores como tipos do Python (valores do NumPy não são adaptados pelo psycopg2)
+def plain(value):
+    return value.item() if hasattr(value, 'item') else value
+
+
+def plain_keys(keys):
+    return [plain(k) for k in keys]
+
+
+# Registro _r de um item
+def reference_sql(entity):
+    return f"select * from {name(entity)}_r where bh_chave = %(bh_chave)s"
+
+
+# Histórico de um item na aba Consulta
+def consult_sql(entity, attributes):
+    return (
+        f"select bh_dthr as tempo,{','.join(names(attributes))} from {name(entity)}_h "
+        f"where ((bh_chave = %(bh_chave)s) and (bh_dthr between %(start)s and %(end)s)) order by tempo"
+    )
+
+
+# Parâmetros do histórico
+def consult_params(bh_chave, start, end):
+    return {'bh_chave': plain(bh_chave), 'start': str(start), 'end': str(end)}
+
+
+# Histórico de todos os itens de uma entidade (tabela larga de vários itens)
+def history_sql(entity, attributes):
+    return (
+        f"select bh_chave, bh_dthr as tempo, {', '.join(names(attributes))} from {name(entity)}_h "
+        f"where (bh_chave = any(%(bh_chave)s)) and (bh_dthr between %(start)s and %(end)s) order by tempo"
+    )
+
+
+# Parâmetros do histórico de vários itens
+def history_params(keys, start, end):
+    return {'bh_chave': plain_keys(keys), 'start': str(start), 'end': str(end)}
+
+
+# Granularidade que divide o intervalo em aproximadamente points intervalos (no mínimo 1 segundo)
+def bucket_width(start, end, points):
+    return f'{max(math.ceil((end - start).total_seconds() / max(points, 1)), 1)} seconds'
+
+
+# Consulta do Filme: uma coluna por atributo e agregação (atributo_agregação se houver mais de uma)
+# Os intervalos já saem no horário local, sem ajuste posterior das linhas
+# many: vários itens da entidade (bh_chave = any), com os intervalos separados por item
+def movie_sql(entity, attributes, functions, fill='', many=False):
+
+    entity = name(entity)
+    columns = []
+
+    if fill not in gapfills:
+        raise ValueError(f'Preenchimento inválido: {fill!r}')
+
+    for att in names(attributes):
+        for function in functions:
+
+            expression = aggregates[function].format(att)
+
+            if fill:
+                expression = f'{fill}({expression})'
+
+            columns.append(f'{expression} as {att if len(functions) == 1 else f"{att}_{function}"}')
+
+    shift = f"interval '{utc_offset} hours'"
+
+    if many:
+        return (
+            f"select bh_chave, time_bucket_gapfill(%(width)s, bh_dthr - {shift}, %(first)s, %(last)s) as tempo, "
+            f"{', '.join(columns)} from {entity}_h "
+            f"where (bh_dthr between %(start)s and %(end)s) and (bh_chave = any(%(bh_chave)s)) "
+            f"group by bh_chave, tempo order by tempo"
+        )
+
+    return (
+        f"select time_bucket_gapfill(%(width)s, bh_dthr - {shift}, %(first)s, %(last)s) as tempo, {', '.join(columns)} "
+        f"from {entity}_h "
+        f"where (bh_dthr between %(start)s and %(end)s) and (bh_chave = %(bh_chave)s) "
+        f"group by tempo order by tempo"
+    )
+
+
+# Parâmetros da consulta do Filme (bh_chave pode ser uma lista de itens)
+def movie_params(start, end, width, bh_chave):
+
+    offset = pd.Timedelta(hours=utc_offset)
+
+    if isinstance(bh_chave, (list, tuple)):
+        bh_chave = plain_keys(bh_chave)
+    else:
+        bh_chave = plain(bh_chave)
+
+    return {
+        'width': width,
+        'start': str(start),
+        'end': str(end),
+        'first': str(start - offset),
+        'last': str(end - offset),
+        'bh_chave': bh_chave
+    }
+
+
+# Filtro dos alarmes de uma lista de itens (mrids), com ou sem a lista de severidades
+def alarm_where(severity=False):
+
+    where = '(mrid = any(%(mrids)s)) and (bh_dthr between %(start)s and %(end)s)'
+
+    if severity:
+        where += ' and (severidade = any(%(severities)s))'
+
+    return where
+
+
+# Consulta dos alarmes (columns: colunas de eve_h separadas por vírgula)
+def alarm_sql(columns, where):
+    return f"select {', '.join(names(columns.split(',')))} from eve_h where ({where}) order by bh_dthr"
@@ -0,0 +1,77 @@
+"""
+
+Módulo Records
+
+        Registros _r dos equipamentos, buscados em lote por entidade e guardados em um cache LRU
+
+"""
+
+
+# Bibliotecas
+import threading
+from collections import OrderedDict
+import Database.Queries as Queries
+import Database.Prepared as Prepared
+
+
+# Cache LRU indexado por (entidade, bh_chave)
+class RecordCache:
+
+    def __init__(self, size=4096):
+
+        self.size = size
+        self.lock = threading.Lock()
+        self.records = OrderedDict()
+
+    @staticmethod
+    def _key(entity, bh_chave):
+        return str(entity).strip(), bh_chave
+
+    # Registro de um item (tabela de uma linha) ou None
+    def get(self, entity, bh_chave):
+
+        key = self._key(entity, bh_chave)
+
+        with self.lock:
+
+            record = self.records.get(key)
+
+            if record is not None:
+                self.records.move_to_end(key)
+
+            return record
+
+    def __contains__(self, key):
+        with self.lock:
+            return self._key(*key) in self.records
+
+    # Guarda o registro de um item
+    def put(self, entity, bh_chave, record):
+
+        key = self._key(entity, bh_chave)
+
+        with self.lock:
+
+            self.records[key] = record
+            self.records.move_to_end(key)
+
+            while len(self.records) > self.size:
+                self.records.popitem(last=False)
+
+    # Busca em uma única consulta os registros de vários itens da mesma entidade
+    def fetch(self, conn, entity, keys):
+
+        entity = Queries.name(entity)
+
+        query = f"select * from {entity}_r where bh_chave = any(%(keys)s)"
+        m = Prepared.read(conn, query, {'keys': Queries.plain_keys(keys)})
+
+        for i, bh_chave in enumerate(m['bh_chave']):
+            self.put(entity, bh_chave, m.iloc[[i]].reset_index(drop=True))
+
+        return len(m)
+
+    # Descarta todos os registros
+    def clear(self):
+        with self.lock:
+            self.records.clear()
@@ -0,0 +1,243 @@
+"""
+
+Módulo Series
+
+        Cache local das séries históricas ({entidade}_h), que busca na base apenas os trechos ainda não guardados
+
+"""
+
+
+# Bibliotecas
+import threading
+from collections import OrderedDict
+import pandas as pd
+import Database.Queries as Queries
+import Database.Prepared as Prepared
+
+
+# Série de um atributo: linhas já buscadas e os intervalos de tempo que elas cobrem
+class Entry:
+    __slots__ = ('name', 'data', 'covered')
+
+    def __init__(self, name):
+
+        self.name = name
+        self.data = pd.DataFrame({'tempo': pd.Series(dtype='datetime64[ns]'), 'valor': pd.Series(dtype=object)})
+        self.covered = []
+
+    def __len__(self):
+        return len(self.data)
+
+    # Substitui as linhas de [start, end] pelas recém-buscadas
+    def merge(self, rows: pd.DataFrame, start, end, stable):
+
+        keep = self.data[(self.data['tempo'] < start) | (self.data['tempo'] > end)]
+        self.data = pd.concat([keep, rows], ignore_index=True).sort_values('tempo', kind='stable', ignore_index=True)
+
+        # O final recente ainda pode mudar na base e não conta como coberto
+        if start <= min(end, stable):
+            self.covered = _union(self.covered + [(start, min(end, stable))])
+
+    # Linhas de [start, end]
+    def slice(self, start, end):
+        tempo = self.data['tempo']
+        return self.data[(tempo >= start) & (tempo <= end)]
+
+
+# União de intervalos fechados
+def _union(intervals):
+
+    merged = []
+
+    for a, b in sorted(intervals):
+        if merged and (a <= merged[-1][1]):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], b))
+        else:
+            merged.append((a, b))
+
+    return merged
+
+
+# Trechos de [start, end] fora dos intervalos cobertos
+def _gaps(covered, start, end):
+
+    gaps = []
+
+    for a, b in covered:
+
+        if b < start:
+            continue
+
+        if a > end:
+            break
+
+        if a > start:
+            gaps.append((start, a))
+
+        start = max(start, b)
+
+    if start < end:
+        gaps.append((start, end))
+
+    return gaps
+
+
+# Cache LRU indexado por (entidade, bh_chave, atributo), limitado pelo total de linhas guardadas
+class SeriesCache:
+
+    # tail: trecho final, em relação a now(), que é sempre buscado de novo
+    # now: horário atual no relógio da base
+    def __init__(self, size=5000000, tail=pd.Timedelta(hours=1), now=pd.Timestamp.now):
+
+        self.size = size
+        self.tail = tail
+        self.now = now
+
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.rows = 0
+
+    @staticmethod
+    def _key(entity, bh_chave, attribute):
+        return str(entity).strip(), bh_chave, attribute
+
+    # Descarta as séries usadas há mais tempo até caber no limite
+    # As séries de keep (as que acabaram de ser guardadas) ficam, mesmo que sozinhas passem do limite:
+    # descartá-las faria a consulta em andamento buscar o intervalo inteiro de novo
+    def _evict(self, keep=()):
+
+        for key in list(self.entries):
+
+            if self.rows <= self.size:
+                break
+
+            if key not in keep:
+                self.rows -= len(self.entries.pop(key))
+
+    def _entry(self, key):
+
+        entry = self.entries.get(key)
+
+        if entry is not None:
+            self.entries.move_to_end(key)
+
+        return entry
+
+    # Trechos de [start, end] que faltam para algum dos atributos
+    def gaps(self, entity, bh_chave, attributes, start, end):
+
+        with self.lock:
+
+            missing = []
+
+            for att in attributes:
+                entry = self._entry(self._key(entity, bh_chave, att))
+                missing += _gaps(entry.covered, start, end) if entry is not None else [(start, end)]
+
+        return _union(missing)
+
+    # Guarda as colunas buscadas para [start, end]
+    def put(self, entity, bh_chave, attributes, rows: pd.DataFrame, start, end):
+
+        stable = pd.Timestamp(self.now()) - self.tail
+
+        keys = [self._key(entity, bh_chave, att) for att in attributes]
+
+        with self.lock:
+
+            for i, key in enumerate(keys):
+
+                entry = self._entry(key)
+
+                if entry is None:
+                    entry = self.entries[key] = Entry(rows.columns[i + 1])
+
+                self.rows -= len(entry)
+
+                column = pd.DataFrame({'tempo': pd.to_datetime(rows.iloc[:, 0]), 'valor': rows.iloc[:, i + 1]})
+                entry.merge(column, start, end, stable)
+
+                self.rows += len(entry)
+
+            self._evict(keys)
+
+    # Tabela tempo + atributos de [start, end] a partir do cache, ou None se as séries não são compatíveis
+    def assemble(self, entity, bh_chave, attributes, start, end):
+
+        with self.lock:
+
+            parts = [self._entry(self._key(entity, bh_chave, att)) for att in attributes]
+
+            if any(k is None for k in parts):
+                return None
+
+            slices = [k.slice(start, end) for k in parts]
+            names = [k.name for k in parts]
+
+        tempo = slices[0]['tempo'].to_numpy()
+
+        # Todas as séries vêm das mesmas linhas; se a base mudou entre as buscas, elas divergem
+        for k in slices[1:]:
+            if (len(k) != len(tempo)) or (k['tempo'].to_numpy() != tempo).any():
+                return None
+
+        table = pd.DataFrame({'tempo': tempo})
+
+        for name, k in zip(names, slices):
+            table[name] = k['valor'].to_numpy()
+
+        return table
+
+    # Busca na base apenas os trechos que faltam e monta a tabela completa
+    def read(self, conn, entity, bh_chave, attributes, start, end):
+
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+
+        for a, b in self.gaps(entity, bh_chave, attributes, start, end):
+            self.put(entity, bh_chave, attributes, self.fetch(conn, entity, bh_chave, attributes, a, b), a, b)
+
+        table = self.assemble(entity, bh_chave, attributes, start, end)
+
+        # Séries incompatíveis: o intervalo inteiro é buscado de novo para todos os atributos
+        if table is None:
+
+            rows = self.fetch(conn, entity, bh_chave, attributes, start, end)
+            self.put(entity, bh_chave, attributes, rows, start, end)
+
+            table = self.assemble(entity, bh_chave, attributes, start, end)
+
+            if table is None:
+                return rows
+
+        return table
+
+    # Consulta de um trecho
+    @staticmethod
+    def fetch(conn, entity, bh_chave, attributes, start, end):
+
+        return Prepared.read(conn, Queries.consult_sql(entity, attributes), Queries.consult_params(bh_chave, start, end))
+
+    # Esquece o que foi buscado a partir de since (todas as séries, ou apenas as da entidade)
+    def invalidate(self, since, entity=None):
+
+        since = pd.Timestamp(since)
+
+        with self.lock:
+
+            for key, entry in self.entries.items():
+
+                if (entity is not None) and (key[0] != str(entity).strip()):
+                    continue
+
+                self.rows -= len(entry)
+
+                entry.data = entry.data[entry.data['tempo'] < since]
+                entry.covered = [(a, min(b, since)) for a, b in entry.covered if a < since]
+
+                self.rows += len(entry)
+
+    # Descarta todas as séries
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.rows = 0
@@ -0,0 +1 @@
+# Database
\ No newline at end of file
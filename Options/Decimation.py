@@ -0,0 +1,68 @@
+"""
+
+Módulo Decimation
+
+		Redução das séries para o gráfico: em cada intervalo de pontos mantém o mínimo e o máximo,
+		preservando o envelope da curva com no máximo dois pontos por pixel
+
+"""
+
+# Bibliotecas
+import numpy as np
+
+
+# Abscissas numéricas e ordenadas, para que cada trecho visível seja encontrado por searchsorted
+def prepare(x: np.ndarray, y: np.ndarray):
+
+	if (len(x) > 1) and np.any(x[1:] < x[:-1]):
+		order = np.argsort(x, kind='stable')
+		x = x[order]
+		y = y[order]
+
+	return x, y
+
+
+# Índices do trecho de x dentro de [left, right], com um ponto de cada lado para a curva chegar às bordas
+def visible(x: np.ndarray, left, right):
+
+	first = max(np.searchsorted(x, left, side='left') - 1, 0)
+	last = min(np.searchsorted(x, right, side='right') + 1, len(x))
+
+	return first, last
+
+
+# Índices do mínimo e do máximo de y[first:last] em cada um de buckets intervalos, em ordem crescente
+def minmax(y: np.ndarray, first: int, last: int, buckets: int):
+
+	n = last - first
+
+	if n <= 2 * buckets:
+		return np.arange(first, last)
+
+	size = n // buckets
+	m = size * buckets
+
+	# NaN (lacunas) só é escolhido quando o intervalo inteiro está vazio
+	block = y[first:first + m].reshape(buckets, size)
+	low = np.argmin(np.where(np.isnan(block), np.inf, block), axis=1)
+	high = np.argmax(np.where(np.isnan(block), -np.inf, block), axis=1)
+
+	offset = first + np.arange(buckets) * size
+	index = np.stack([offset + np.minimum(low, high), offset + np.maximum(low, high)], axis=1).ravel()
+
+	# Pontos que sobram no final (menos que um intervalo) formam um último intervalo
+	if m < n:
+		tail = y[first + m:last]
+		edge = [np.argmin(np.where(np.isnan(tail), np.inf, tail)), np.argmax(np.where(np.isnan(tail), -np.inf, tail))]
+		index = np.concatenate([index, first + m + np.unique(edge)])
+
+	return index
+
+
+# Pontos de uma série a desenhar entre left e right
+def decimate(x: np.ndarray, y: np.ndarray, left, right, buckets: int):
+
+	first, last = visible(x, left, right)
+	index = minmax(y, first, last, buckets)
+
+	return x[index], y[index]
@@ -1,14 +1,16 @@
 import sys
 import os
+import numpy as np
 import pandas as pd
 import matplotlib as mpl
 import matplotlib.dates as dates
 import matplotlib.ticker as ticker
-import PyQt5.uic as uic
+import UI.Forms as forms
 from PyQt5 import QtWidgets, QtGui, QtCore
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
 from matplotlib.figure import Figure
+import Options.Decimation as decimation
 
 path = os.path.dirname(os.path.abspath(sys.argv[0]))
 icon_path = path + '\\Icon\\'
@@ -143,14 +145,51 @@ class Graphics(QtWidgets.QWidget):
 		self.table = table
 		self.labels = self.table.columns
 		
-		self.plot_widget = None
-		
 		self.fig = Figure(figsize=(16, 9), dpi=100, tight_layout=True)
 		self.canvas = FigureCanvas(self.fig)
 		self.toolbar = NavigationToolbar(self.canvas, None)
-		self.ax = None
 		
-		self.ui = uic.loadUi(path + '\\UI\\graphic_options.ui')
+		# Eixos e linhas persistentes: cada Apply apenas atualiza os dados das linhas
+		self.ax = self.fig.add_subplot(111)
+		self.legend = None
+		
+		# Séries completas (abscissas numéricas e ordenadas), redesenhadas por decimação a cada zoom
+		self.x = None
+		self.y = None
+		self.series = []
+		self.lines = {}
+		
+		self.ax.spines['right'].set_visible(False)
+		self.ax.spines['top'].set_visible(False)
+		
+		def fmt(x, _):
+			return fr'${round(x, 3)}$'
+		
+		self.number_formatter = ticker.FuncFormatter(fmt)
+		self.ax.yaxis.set_major_formatter(self.number_formatter)
+		self.ax.tick_params(labelsize='large')
+		
+		# Zoom e deslocamento pela NavigationToolbar refazem a decimação a partir dos dados completos
+		self.ax.callbacks.connect('xlim_changed', self.resample)
+		
+		# Cursor desenhado por blit sobre a última imagem completa do gráfico
+		self.background = None
+		self.cursor = self.ax.axvline(0, color='#808080', linewidth=0.8, animated=True, visible=False)
+		self.cursor_text = self.ax.text(
+				0.99, 0.99, '', transform=self.ax.transAxes, ha='right', va='top', animated=True, visible=False
+		)
+		
+		self.canvas.mpl_connect('draw_event', self.save_background)
+		self.canvas.mpl_connect('motion_notify_event', self.move_cursor)
+		self.canvas.mpl_connect('axes_leave_event', self.hide_cursor)
+		
+		self.plot_widget = QtWidgets.QWidget(self)
+		layout_mpl = QtWidgets.QGridLayout(self.plot_widget)
+		
+		layout_mpl.addWidget(self.canvas)
+		layout_mpl.addWidget(self.toolbar)
+		
+		self.ui = forms.load('graphic_options')
 		self.ui.setAttribute(QtCore.Qt.WA_QuitOnClose, False)
 		self.ui.setWindowIcon(QtGui.QIcon(icon_path + 'options.png'))
 		
@@ -169,59 +208,29 @@ class Graphics(QtWidgets.QWidget):
 	def set_plot(self):
 		
 		xlabel = self.ui.xdata.currentText()
-		ylabel = self.combo.currentText().split(', ')
-
-		xdata = self.table[xlabel]
-		
-		ydata = []
-		
-		for item in ylabel:
-			ydata.append(self.table[item])
-		
-		ydata = pd.concat(ydata, axis=1)
-		
-		self.ax = self.fig.add_subplot(111)
+		ylabel = self.combo.currentData()
 		
 		try:
-		
-			self.ax.plot(xdata, ydata, label=ylabel)
-			
-			leg = self.ax.legend([f'${k}$' for k in ylabel], fontsize=14, loc='upper left')
-			leg.set_draggable(True, use_blit=True)
 			
-			max_yvalue = ydata.max().max()
-			min_yvalue = ydata.min().min()
+			xdata = self.table[xlabel]
+			ydata = pd.concat([self.table[item] for item in ylabel], axis=1)
 			
-			self.ax.set_xlim(xdata.min(), xdata.max())
-			self.ax.set_ylim(min_yvalue, max_yvalue)
+			is_date = pd.api.types.is_datetime64_any_dtype(xdata)
 			
-			self.ax.spines['right'].set_visible(False)
-			self.ax.spines['top'].set_visible(False)
-			
-			def fmt(x, _):
-				return fr'${round(x, 3)}$'
-			
-			self.ax.yaxis.set_major_formatter(ticker.FuncFormatter(fmt))
-			
-			if xlabel == 'tempo':
-				
-				self.ax.xaxis.set_major_formatter(dates.DateFormatter('${%Y-%m-%d}$' + '\n' + '${%H:%M:%S}$'))
-				
-				self.ax.xaxis.set_major_locator(dates.AutoDateLocator())
-				
+			if is_date:
+				x = dates.date2num(pd.to_datetime(xdata).dt.tz_localize(None))
 			else:
-				
-				self.ax.xaxis.set_major_formatter(ticker.FuncFormatter(fmt))
+				x = xdata.to_numpy(dtype=float)
 			
-			self.ax.tick_params(labelsize='large')
+			x, y = decimation.prepare(x, ydata.to_numpy(dtype=float))
 			
-			self.plot_widget = QtWidgets.QWidget(self)
-			layout_mpl = QtWidgets.QGridLayout(self.plot_widget)
+			max_yvalue = np.nanmax(y)
+			min_yvalue = np.nanmin(y)
 			
-			layout_mpl.addWidget(self.canvas)
-			layout_mpl.addWidget(self.toolbar)
+			if not (np.isfinite(min_yvalue) and np.isfinite(max_yvalue)):
+				raise ValueError
 			
-		except (ValueError, TypeError):
+		except (ValueError, TypeError, IndexError):
 			warn = QtWidgets.QMessageBox(self)
 			warn.setWindowTitle('Gráfico')
 			warn.setText('Dados não-numéricos!')
@@ -229,6 +238,97 @@ class Graphics(QtWidgets.QWidget):
 			warn.setIcon(warn.Information)
 			warn.setStandardButtons(warn.Ok | warn.Cancel)
 			warn.show()
+			return
+		
+		self.x, self.y = x, y
+		self.series = list(ylabel)
+		
+		# Remove as linhas desmarcadas e cria apenas as novas; as demais mantêm a cor
+		for k in [k for k in self.lines if k not in self.series]:
+			self.lines.pop(k).remove()
+		
+		for k in self.series:
+			if k not in self.lines:
+				self.lines[k], = self.ax.plot([], [], label=k)
+		
+		if self.legend is not None:
+			self.legend.remove()
+		
+		self.legend = self.ax.legend(
+				[self.lines[k] for k in self.series], [f'${k}$' for k in self.series], fontsize=14, loc='upper left'
+		)
+		self.legend.set_draggable(True, use_blit=True)
+		
+		if (xlabel == 'tempo') or is_date:
+			
+			self.ax.xaxis_date()
+			
+			self.ax.xaxis.set_major_formatter(dates.DateFormatter('${%Y-%m-%d}$' + '\n' + '${%H:%M:%S}$'))
+			
+			self.ax.xaxis.set_major_locator(dates.AutoDateLocator())
+			
+		else:
+			
+			self.ax.xaxis.set_major_formatter(self.number_formatter)
+			
+			self.ax.xaxis.set_major_locator(ticker.AutoLocator())
+		
+		self.ax.set_ylim(min_yvalue, max_yvalue)
+		
+		# set_xlim dispara resample, que desenha as linhas
+		self.ax.set_xlim(self.x[0], self.x[-1])
+	
+	# Redesenha o trecho visível com no máximo dois pontos por pixel de largura
+	def resample(self, ax):
+		
+		if (self.x is None) or (len(self.x) == 0):
+			return
+		
+		left, right = ax.get_xlim()
+		buckets = max(int(ax.bbox.width), 100)
+		
+		for i, k in enumerate(self.series):
+			self.lines[k].set_data(*decimation.decimate(self.x, self.y[:, i], left, right, buckets))
+		
+		self.canvas.draw_idle()
+	
+	# Imagem do gráfico sem o cursor, restaurada a cada movimento do mouse
+	def save_background(self, _):
+		self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+	
+	def blit_cursor(self):
+		
+		self.canvas.restore_region(self.background)
+		
+		self.ax.draw_artist(self.cursor)
+		self.ax.draw_artist(self.cursor_text)
+		
+		self.canvas.blit(self.fig.bbox)
+	
+	# Linha vertical e valores sob o mouse
+	def move_cursor(self, event):
+		
+		# Durante zoom e deslocamento o gráfico é redesenhado por inteiro
+		if (event.inaxes is not self.ax) or (self.background is None) or self.toolbar.mode:
+			return
+		
+		self.cursor.set_xdata([event.xdata, event.xdata])
+		self.cursor.set_visible(True)
+		
+		self.cursor_text.set_text(f'{self.ax.format_xdata(event.xdata)}  {self.ax.format_ydata(event.ydata)}')
+		self.cursor_text.set_visible(True)
+		
+		self.blit_cursor()
+	
+	def hide_cursor(self, _):
+		
+		if self.background is None:
+			return
+		
+		self.cursor.set_visible(False)
+		self.cursor_text.set_visible(False)
+		
+		self.blit_cursor()
 	
 	def ui_show(self):
 		self.ui.show()
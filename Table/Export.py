@@ -0,0 +1,107 @@
+"""
+
+Módulo Export
+
+        Gravação das tabelas em CSV (simples ou comprimido), Parquet e Feather/Arrow IPC
+
+"""
+
+
+# Bibliotecas
+import os
+import gzip
+import bz2
+import lzma
+import pandas as pd
+
+# pyarrow é opcional: sem ele, apenas os formatos CSV ficam disponíveis
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import pyarrow.ipc as ipc
+except ImportError:
+    pa = None
+
+
+# Linhas gravadas entre dois avisos de progresso
+chunk_size = 100000
+
+# Arquivos CSV comprimidos, pela extensão
+compressors = {
+    '.gz': gzip.open,
+    '.bz2': bz2.open,
+    '.xz': lzma.open
+}
+
+
+# Formato escolhido pela extensão do arquivo; qualquer outra extensão grava CSV separado por ';'
+def file_format(name: str):
+
+    name = name.lower()
+
+    if name.endswith(('.parquet', '.pq')):
+        return 'parquet'
+
+    if name.endswith(('.feather', '.arrow', '.ipc')):
+        return 'arrow'
+
+    return 'csv'
+
+
+def _csv(data: pd.DataFrame, name: str, temp: str, progress):
+
+    extension = os.path.splitext(name.lower())[1]
+    opener = compressors.get(extension, open)
+
+    with opener(temp, 'wt', encoding='utf-8', newline='') as file:
+
+        for i in range(0, len(data), chunk_size):
+            data.iloc[i:i + chunk_size].to_csv(file, sep=';', index=False, header=(i == 0))
+            progress(min(i + chunk_size, len(data)))
+
+        if len(data) == 0:
+            data.to_csv(file, sep=';', index=False)
+
+
+def _arrow(data: pd.DataFrame, name: str, temp: str, progress):
+
+    if pa is None:
+        raise ImportError('A biblioteca pyarrow é necessária para gravar arquivos Parquet e Feather/Arrow')
+
+    # A conversão é feita uma única vez, para que todos os blocos tenham o mesmo esquema
+    table = pa.Table.from_pandas(data.rename(columns=str), preserve_index=False)
+
+    if file_format(name) == 'parquet':
+        writer = pq.ParquetWriter(temp, table.schema, compression='zstd')
+    else:
+        writer = ipc.new_file(temp, table.schema, options=ipc.IpcWriteOptions(compression='zstd'))
+
+    with writer:
+        for i in range(0, max(table.num_rows, 1), chunk_size):
+            writer.write_table(table.slice(i, chunk_size))
+            progress(min(i + chunk_size, table.num_rows))
+
+
+# Grava a tabela; progress recebe o percentual já gravado
+# O arquivo só substitui o anterior ao final, de modo que uma gravação interrompida não o corrompe
+def export(data: pd.DataFrame, name: str, progress=None):
+
+    rows = max(len(data), 1)
+    report = (lambda n: progress(100 * n // rows)) if progress is not None else (lambda n: None)
+
+    temp = name + '.tmp'
+
+    try:
+
+        if file_format(name) == 'csv':
+            _csv(data, name, temp, report)
+        else:
+            _arrow(data, name, temp, report)
+
+        os.replace(temp, name)
+
+    finally:
+        if os.path.exists(temp):
+            os.remove(temp)
+
+    return name
@@ -10,9 +10,12 @@ Módulo Table
 # Bibliotecas
 import sys
 import os
+import io
+from bisect import bisect_right
+from collections import OrderedDict
+import numpy as np
 import pandas as pd
-import Options.GraphicOpt as graphics
-import PyQt5.uic as uic
+import UI.Forms as forms
 from PyQt5 import QtWidgets, QtGui, QtCore
 
 
@@ -22,27 +25,213 @@ icon_path = path + '\\Icon\\'
 user_path = os.getenv('userprofile')
 
 
+# Arquivo sugerido para gravar uma tabela (também usado pela janela principal, sem criar a janela da tabela)
+def default_filename():
+    return user_path + '\\consulta.csv'
+
+
+# Linhas expostas à vista a cada fetchMore
+fetch_size = 10000
+
+# Textos formatados são guardados em janelas de linhas; somente as últimas janelas usadas ficam em memória
+window_size = 256
+window_cache = 64
+
+
+# Valores de uma coluna: arrays NumPy, exceto datas (mantidas como Timestamp para a formatação usual)
+def _column(series: pd.Series):
+    
+    if isinstance(series.dtype, np.dtype) and series.dtype.kind not in 'mM':
+        return series.to_numpy()
+    
+    return series.array
+
+
 # Modelo da tabela
+# Os dados ficam em colunas (um array por coluna e por bloco recebido) e o texto de cada célula
+# só é formatado quando a janela de linhas que o contém é pintada
 class PandasModel(QtCore.QAbstractTableModel):
     
     def __init__(self, data: pd.DataFrame):
         super().__init__()
         self._data = data
+        self._columns = list(data.columns)
+        
+        # Blocos recebidos aos poucos (consultas transmitidas) e a linha inicial de cada um
+        self._chunks = [data]
+        self._arrays = [self._split(data)]
+        self._starts = [0]
+        self._rows = data.shape[0]
+        
+        # Linhas já expostas à vista (o restante é entregue por fetchMore)
+        self._loaded = min(self._rows, fetch_size)
+        
+        self._windows = OrderedDict()
+    
+    @staticmethod
+    def _split(data: pd.DataFrame):
+        return [_column(data.iloc[:, j]) for j in range(data.shape[1])]
         
     # Método para salvar a tabela
     def save(self, name: str):
-        self._data.to_csv(name, ';', index=False)
+        import Table.Export as export
+        export.export(self.get_data(), name)
         
+    # Junta os blocos recebidos em uma única tabela
     def get_data(self):
+        
+        if len(self._chunks) > 1:
+            self._data = pd.concat(self._chunks, ignore_index=True)
+            self._chunks = [self._data]
+            self._arrays = [self._split(self._data)]
+            self._starts = [0]
+        
         return self._data
     
+    # Acrescenta um bloco de linhas ao final da tabela
+    def append(self, chunk: pd.DataFrame):
+        
+        if len(chunk) == 0:
+            return
+        
+        # A última janela formatada pode estar incompleta
+        self._windows.pop(self._rows // window_size, None)
+        
+        complete = self._loaded == self._rows
+        
+        self._chunks.append(chunk)
+        self._arrays.append(self._split(chunk))
+        self._starts.append(self._rows)
+        self._rows += len(chunk)
+        
+        # Se todas as linhas já estavam à vista, as novas também aparecem
+        if complete:
+            self.fetchMore()
+    
+    # Acrescenta um bloco de linhas no início da tabela (navegação por páginas)
+    def prepend(self, chunk: pd.DataFrame):
+        
+        if len(chunk) == 0:
+            return
+        
+        self.beginInsertRows(QtCore.QModelIndex(), 0, len(chunk) - 1)
+        
+        self._chunks.insert(0, chunk)
+        self._arrays.insert(0, self._split(chunk))
+        self._rows += len(chunk)
+        self._loaded += len(chunk)
+        self._reindex()
+        
+        self.endInsertRows()
+    
+    # Retira count linhas do início (first=True) ou do final da tabela
+    def remove_rows(self, count: int, first=True):
+        
+        count = min(count, self._rows)
+        
+        if count <= 0:
+            return
+        
+        start = 0 if first else self._rows - count
+        
+        self.beginRemoveRows(QtCore.QModelIndex(), start, start + count - 1)
+        
+        left = count
+        
+        while left > 0:
+            
+            k = 0 if first else len(self._chunks) - 1
+            size = len(self._chunks[k])
+            
+            if size <= left and len(self._chunks) > 1:
+                del self._chunks[k]
+                del self._arrays[k]
+            else:
+                chunk = self._chunks[k].iloc[left:] if first else self._chunks[k].iloc[:size - left]
+                self._chunks[k] = chunk.reset_index(drop=True)
+                self._arrays[k] = self._split(self._chunks[k])
+            
+            left -= min(size, left)
+        
+        self._rows -= count
+        self._loaded = max(self._loaded - count, 0)
+        self._reindex()
+        
+        self.endRemoveRows()
+    
+    # Recalcula as linhas iniciais dos blocos depois de inserir ou retirar um bloco
+    def _reindex(self):
+        
+        self._starts = []
+        row = 0
+        
+        for chunk in self._chunks:
+            self._starts.append(row)
+            row += len(chunk)
+        
+        if len(self._chunks) == 1:
+            self._data = self._chunks[0]
+        
+        self._windows.clear()
+    
+    def canFetchMore(self, parent=QtCore.QModelIndex()):
+        return (not parent.isValid()) and (self._loaded < self._rows)
+    
+    def fetchMore(self, parent=QtCore.QModelIndex()):
+        
+        count = min(fetch_size, self._rows - self._loaded)
+        
+        if parent.isValid() or (count <= 0):
+            return
+        
+        self.beginInsertRows(QtCore.QModelIndex(), self._loaded, self._loaded + count - 1)
+        self._loaded += count
+        self.endInsertRows()
+    
+    # Textos de uma janela de linhas: uma lista por coluna
+    def _window(self, w: int):
+        
+        window = self._windows.get(w)
+        
+        if window is not None:
+            self._windows.move_to_end(w)
+            return window
+        
+        first = w * window_size
+        last = min(first + window_size, self._rows)
+        
+        window = [[] for _ in self._columns]
+        k = bisect_right(self._starts, first) - 1
+        
+        while first < last:
+            
+            a = first - self._starts[k]
+            b = min(last - self._starts[k], len(self._chunks[k]))
+            
+            for text, values in zip(window, self._arrays[k]):
+                text.extend([str(v) for v in values[a:b]])
+            
+            first = self._starts[k] + b
+            k += 1
+        
+        self._windows[w] = window
+        
+        while len(self._windows) > window_cache:
+            self._windows.popitem(last=False)
+        
+        return window
+    
+    # Número de linhas recebidas, inclusive as ainda não expostas
+    def total_rows(self):
+        return self._rows
+    
     # Número de linhas
-    def rowCount(self, parent=None):
-        return self._data.shape[0]
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else self._loaded
     
     # Número de colunas
-    def columnCount(self, parent=None):
-        return self._data.shape[1]
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self._columns)
     
     # Dados
     def data(self, index, role=QtCore.Qt.DisplayRole):
@@ -50,10 +239,11 @@ class PandasModel(QtCore.QAbstractTableModel):
         if index.isValid():
             
             if role == QtCore.Qt.DisplayRole:
-                return str(self._data.iloc[index.row(), index.column()])
+                row = index.row()
+                return self._window(row // window_size)[index.column()][row % window_size]
             
             if role == QtCore.Qt.UserRole:
-                return str(self._data.columns[index.column()])
+                return str(self._columns[index.column()])
             
             if role == QtCore.Qt.TextAlignmentRole:
                 return QtCore.Qt.AlignCenter
@@ -64,68 +254,86 @@ class PandasModel(QtCore.QAbstractTableModel):
     def headerData(self, index: int, orientation: QtCore.Qt.Orientation, role: int = ...):
         
         if orientation == QtCore.Qt.Horizontal and role == QtCore.Qt.DisplayRole:
-            return self._data.columns[index]
+            return self._columns[index]
         
         if orientation == QtCore.Qt.Vertical and role == QtCore.Qt.DisplayRole:
+            
+            if len(self._chunks) > 1:
+                return index
+            
             return self._data.index[index]
         
         return QtCore.QAbstractTableModel.headerData(self, index, orientation, role)
 
 
-# Função que permite extrair os itens selecionados pelo o usuário
-def get_selection(table_view: QtWidgets.QTableView, model=None):
+# Linhas selecionadas de cada coluna, a partir dos intervalos da seleção (e não de cada índice)
+# Uma coluna selecionada inteira inclui as linhas ainda não expostas por fetchMore
+def selected_rows(table_view: QtWidgets.QTableView):
     
-    selection = table_view.selectedIndexes()
+    selection = table_view.selectionModel()
+    model = table_view.model()
     
-    if selection:
-
-        table = {}
-
-        if model is None:
-
-            for index in selection:
-
-                value = index.data(QtCore.Qt.DisplayRole)
-                label = index.data(QtCore.Qt.UserRole)
-
-                if label not in table.keys():
-                    table[label] = []
-
-                table[label].append(value)
-
-            table = pd.DataFrame(dict([(k, pd.Series(v)) for k, v in table.items()]))
-
-            return table
-
+    if (selection is None) or (model is None):
+        return {}
+    
+    loaded = model.rowCount()
+    total = model.total_rows() if isinstance(model, PandasModel) else loaded
+    
+    ranges = {}
+    
+    for r in selection.selection():
+        
+        top, bottom = r.top(), r.bottom() + 1
+        
+        if (top == 0) and (bottom == loaded):
+            bottom = total
+        
+        for column in range(r.left(), r.right() + 1):
+            ranges.setdefault(column, []).append((top, bottom))
+    
+    rows = {}
+    
+    for column, spans in sorted(ranges.items()):
+        
+        if len(spans) == 1:
+            rows[column] = slice(*spans[0])
         else:
-            data_table = model.get_data()
-
-            for index in selection:
-
-                value = data_table.iloc[index.row(), index.column()]
-                label = index.data(QtCore.Qt.UserRole)
-
-                if label not in table.keys():
-                    table[label] = []
-
-                table[label].append(value)
-
-            table = pd.DataFrame(dict([(k, pd.Series(v)) for k, v in table.items()]))
+            rows[column] = np.unique(np.concatenate([np.arange(a, b) for a, b in spans]))
+    
+    return rows
 
-            return table
 
-    else:
+# Função que permite extrair os itens selecionados pelo o usuário
+# Cada coluna é recortada de uma só vez; colunas com menos linhas são completadas com vazios
+def get_selection(table_view: QtWidgets.QTableView, model=None):
+    
+    if model is None:
+        model = table_view.model()
+    
+    rows = selected_rows(table_view)
+    
+    if (len(rows) == 0) or (not isinstance(model, PandasModel)):
         return pd.DataFrame()
-      
+    
+    data = model.get_data()
+    table = {}
+    
+    for column, r in rows.items():
+        table[str(data.columns[column])] = data.iloc[r, column].reset_index(drop=True)
+    
+    return pd.DataFrame(table)
+
 
-def to_clipboard(table_view: QtWidgets.QTableView):
+# Copia a seleção como texto separado por tabulações, escrito em blocos de linhas
+def to_clipboard(table_view: QtWidgets.QTableView, chunk=50000):
     
-    try:
-        df = get_selection(table_view)
-        df.to_clipboard(index=False)
+    table = get_selection(table_view)
+    buffer = io.StringIO()
     
-    except AttributeError:
-        pd.DataFrame().to_clipboard(index=False)
+    for i in range(0, len(table), chunk):
+        table.iloc[i:i + chunk].to_csv(buffer, sep='\t', index=False, header=(i == 0))
+    
+    QtWidgets.QApplication.clipboard().setText(buffer.getvalue())
 
 
 # Opções da tabela
@@ -192,17 +400,47 @@ class TableWindow(QtWidgets.QMainWindow):
         super().__init__()
         
         # Janela
-        self.ui = uic.loadUi(path + '\\UI\\tabela.ui')
+        self.ui = forms.load('tabela')
         self.ui.setAttribute(QtCore.Qt.WA_QuitOnClose, False)
         self.ui.setWindowIcon(QtGui.QIcon(icon_path + 'database.png'))
         
         self.ui.table_explorer_button.clicked.connect(self.open_explorer)
 
-        self.ui.table_filename.setText(user_path + '\\consulta.csv')
+        self.ui.table_filename.setText(default_filename())
         
         self.model = None
         self.graph = None
-        self.splitter = None
+        self.stream = None
+        
+        # Divisor entre a tabela e o gráfico, criado uma única vez
+        self.splitter = QtWidgets.QSplitter(QtCore.Qt.Horizontal)
+        self.splitter.setStyleSheet("QSplitter::handle{"
+                                    "background-color: white;"
+                                    "border: 1px solid #D8D8D8;"
+                                    "}")
+        
+        self.splitter.addWidget(self.ui.table_widget)
+        self.ui.grid.addWidget(self.splitter)
+        
+        # Fila de tarefas da janela principal, usada para gravar os arquivos em segundo plano
+        self.executor = None
+        
+        self.ui.stop_button.clicked.connect(self.stop_stream)
+        self.ui.stop_button.hide()
+        
+        # Navegação por páginas: consulta, (primeira chave, última chave, linhas) de cada página carregada
+        # e tarefa em andamento
+        self.pager = None
+        self.page_keys = []
+        self.page_task = None
+        self.page_generation = 0
+        self.page_at_start = True
+        self.page_at_end = True
+        
+        self.ui.page_jump.clicked.connect(self.jump_to_time)
+        self.ui.tableView.verticalScrollBar().valueChanged.connect(self.page_scrolled)
+        self.show_page_controls(False)
+        self.ui.export_progress.hide()
 
         self.ui.open_graphics.triggered.connect(self.open_graphic_options)
         
@@ -211,9 +449,190 @@ class TableWindow(QtWidgets.QMainWindow):
         
     # Define os dados a serem mostrados
     def set_data(self, data=pd.DataFrame()):
+        self.end_paging()
+        self.show_data(data)
+    
+    def show_data(self, data: pd.DataFrame):
         self.model = PandasModel(data)
         set_table_options(self.ui.tableView, self.model)
     
+    # Navegação por páginas (pager: Database.Pages.Pager), começando em start
+    # Só as últimas pager.pages páginas ficam em memória; as demais são buscadas de novo ao rolar a tabela
+    def start_paging(self, pager, start=None):
+        
+        self.stop_stream()
+        self.set_data()
+        
+        self.pager = pager
+        
+        if start is not None:
+            self.ui.page_time.setDateTime(start)
+        
+        self.show_page_controls(True)
+        self.load_page('at', None)
+    
+    def end_paging(self):
+        
+        self.pager = None
+        self.page_keys = []
+        self.page_task = None
+        self.page_generation += 1
+        
+        self.show_page_controls(False)
+    
+    def show_page_controls(self, visible: bool):
+        self.ui.page_time.setVisible(visible)
+        self.ui.page_jump.setVisible(visible)
+    
+    # Busca uma página: 'at' (a partir de um instante), 'after' ou 'before' (de uma chave)
+    def load_page(self, direction, bound):
+        
+        if (self.pager is None) or (self.executor is None):
+            return
+        
+        # Um salto descarta a página que ainda estiver a caminho
+        if direction == 'at':
+            self.page_generation += 1
+        elif self.page_task is not None:
+            return
+        
+        generation = self.page_generation
+        function = {'at': self.pager.at, 'after': self.pager.after, 'before': self.pager.before}[direction]
+        
+        self.page_task = self.executor.submit(
+                function, bound,
+                result=lambda page: self.add_page(generation, direction, bound, page),
+                error=lambda error: self.page_failed(generation, error)
+        )
+    
+    # Página recebida
+    def add_page(self, generation, direction, bound, page):
+        
+        if generation != self.page_generation:
+            return
+        
+        self.page_task = None
+        
+        data, first, last = page
+        full = len(data) >= self.pager.page
+        
+        if direction == 'at':
+            
+            self.show_data(data)
+            self.page_keys = [(first, last, len(data))] if len(data) > 0 else []
+            self.page_at_start = bound is None
+            self.page_at_end = not full
+        
+        elif direction == 'after':
+            
+            self.page_at_end = not full
+            
+            if len(data) > 0:
+                
+                self.model.append(data)
+                self.page_keys.append((first, last, len(data)))
+                
+                if len(self.page_keys) > self.pager.pages:
+                    self.drop_page(first=True)
+        
+        else:
+            
+            self.page_at_start = not full
+            
+            if len(data) > 0:
+                
+                self.model.prepend(data)
+                self.page_keys.insert(0, (first, last, len(data)))
+                self.shift_scroll(len(data))
+                
+                if len(self.page_keys) > self.pager.pages:
+                    self.drop_page(first=False)
+        
+        # Se a página não encheu a tela, continua buscando
+        self.page_scrolled(self.ui.tableView.verticalScrollBar().value())
+    
+    # Descarta a página mais distante da posição atual
+    def drop_page(self, first: bool):
+        
+        count = self.page_keys.pop(0 if first else -1)[2]
+        self.model.remove_rows(count, first)
+        
+        if first:
+            self.page_at_start = False
+            self.shift_scroll(-count)
+        else:
+            self.page_at_end = False
+    
+    # Mantém as mesmas linhas à vista depois de inserir ou retirar linhas acima delas
+    def shift_scroll(self, rows: int):
+        bar = self.ui.tableView.verticalScrollBar()
+        bar.setValue(bar.value() + rows * self.ui.tableView.verticalHeader().defaultSectionSize())
+    
+    # Busca a página seguinte ou a anterior ao chegar perto do final ou do início da tabela
+    def page_scrolled(self, value):
+        
+        if (self.pager is None) or (self.page_task is not None) or (len(self.page_keys) == 0):
+            return
+        
+        bar = self.ui.tableView.verticalScrollBar()
+        
+        if (value >= bar.maximum() - bar.pageStep()) and not self.page_at_end:
+            self.load_page('after', self.page_keys[-1][1])
+        
+        elif (value <= bar.minimum() + bar.pageStep()) and not self.page_at_start:
+            self.load_page('before', self.page_keys[0][0])
+    
+    # Salta para a primeira linha a partir do instante escolhido
+    def jump_to_time(self):
+        self.load_page('at', self.ui.page_time.dateTime().toPyDateTime())
+    
+    def page_failed(self, generation, error):
+        
+        if generation != self.page_generation:
+            return
+        
+        self.page_task = None
+        
+        warn = QtWidgets.QMessageBox(self)
+        warn.setWindowTitle('Consulta')
+        warn.setText('Não foi possível buscar a página!')
+        warn.setIcon(warn.Warning)
+        warn.setInformativeText(str(error))
+        warn.setStandardButtons(warn.Ok)
+        warn.show()
+    
+    # Inicia uma tabela que receberá os dados aos poucos (task: tarefa que os transmite)
+    def start_stream(self, task):
+        
+        self.stop_stream()
+        self.set_data()
+        
+        self.stream = task
+        self.ui.stop_button.show()
+    
+    # Acrescenta um bloco recebido
+    def append_data(self, chunk: pd.DataFrame):
+        
+        if (self.model is None) or (self.model.columnCount() == 0):
+            self.set_data(chunk)
+        else:
+            self.model.append(chunk)
+    
+    # Interrompe a transmissão, mantendo as linhas já recebidas
+    def stop_stream(self):
+        
+        if self.stream is not None:
+            self.stream.cancel()
+        
+        self.end_stream()
+    
+    # Fim da transmissão (ignorado se task já não é a transmissão atual)
+    def end_stream(self, task=None):
+        
+        if (task is None) or (task is self.stream):
+            self.stream = None
+            self.ui.stop_button.hide()
+    
     # Menu de contexto
     def context_menu(self, position):
         menu = QtWidgets.QMenu()
@@ -230,10 +649,7 @@ class TableWindow(QtWidgets.QMainWindow):
         action = menu.exec(self.ui.tableView.mapToGlobal(position))
         
         if action == save_table:
-            try:
-                self.model.save(self.ui.table_filename.text())
-            except AttributeError:
-                pd.DataFrame.to_csv(path_or_buf=self.ui.table_filename.text(), sep=';')
+            self.save_table()
         
         elif action == save_selection:
             self.save_selection()
@@ -247,17 +663,56 @@ class TableWindow(QtWidgets.QMainWindow):
         dlg = QtWidgets.QFileDialog(self)
         dlg.setWindowIcon(QtGui.QIcon(icon_path + 'folder.png'))
         dlg.setFileMode(QtWidgets.QFileDialog.AnyFile)
-        dlg.setNameFilters(['Any Files (*)', 'CSV (*.csv)'])
+        dlg.setNameFilters(['Any Files (*)', 'CSV (*.csv)', 'CSV comprimido (*.csv.gz *.csv.bz2 *.csv.xz)',
+                            'Parquet (*.parquet)', 'Feather/Arrow (*.feather *.arrow)'])
         dlg.selectNameFilter('Any Files (*)')
         
         if dlg.exec_():
             filenames = dlg.selectedFiles()
             self.ui.table_filename.setText(filenames[0])
     
+    # Salvar a tabela inteira
+    def save_table(self):
+        if self.model is not None:
+            self.export(self.model.get_data())
+    
     # Salvar itens selecionados pelo usuário
     def save_selection(self):
-        table = get_selection(self.ui.tableView)
-        table.to_csv(self.ui.table_filename.text(), ';', index=False)
+        self.export(get_selection(self.ui.tableView, self.model))
+    
+    # Grava a tabela em segundo plano, no formato indicado pela extensão do arquivo
+    def export(self, table: pd.DataFrame):
+        
+        # pyarrow (Parquet/Arrow) só é carregado na primeira gravação
+        import Table.Export as export
+        
+        name = self.ui.table_filename.text()
+        
+        if self.executor is None:
+            export.export(table, name)
+            return
+        
+        self.ui.export_progress.setValue(0)
+        self.ui.export_progress.show()
+        
+        self.executor.submit(
+                export.export, table, name,
+                progress=self.ui.export_progress.setValue,
+                error=self.export_failed,
+                finished=self.ui.export_progress.hide,
+                connection=False
+        )
+    
+    # Erro na gravação
+    def export_failed(self, error):
+        
+        warn = QtWidgets.QMessageBox(self)
+        warn.setWindowTitle('Salvar tabela')
+        warn.setText('Não foi possível salvar a tabela!')
+        warn.setIcon(warn.Warning)
+        warn.setInformativeText(str(error))
+        warn.setStandardButtons(warn.Ok)
+        warn.show()
     
     # Copiar
     def copy(self):
@@ -278,6 +733,11 @@ class TableWindow(QtWidgets.QMainWindow):
             warn.show()
             
         else:
+            
+            self.close_graph()
+            
+            # matplotlib só é carregado quando o primeiro gráfico é aberto
+            import Options.GraphicOpt as graphics
         
             self.graph = graphics.Graphics(table)
             self.graph.ui.buttonBox.button(QtWidgets.QDialogButtonBox.Ok).clicked.connect(self.set_plot)
@@ -287,28 +747,37 @@ class TableWindow(QtWidgets.QMainWindow):
     def allow_menubar(self, allow: bool):
         self.ui.menu.setEnabled(allow)
         
+    # Esconde o gráfico, mantendo a tabela
     def clear_plot(self):
-        if self.ui.findChild(QtWidgets.QSplitter) is not None:
-            self.splitter.deleteLater()
-            self.ui.grid.addWidget(self.ui.table_widget)
+        if self.graph is not None:
+            self.graph.plot_widget.hide()
+    
+    # Descarta o gráfico atual e sua figura
+    def close_graph(self):
+        
+        if self.graph is None:
+            return
+        
+        self.graph.ui.close()
+        self.graph.ui.deleteLater()
+        self.graph.plot_widget.setParent(None)
+        self.graph.plot_widget.deleteLater()
+        self.graph.deleteLater()
+        
+        self.graph = None
         
     def set_plot(self):
         self.graph.set_plot()
-
-        self.clear_plot()
-            
-        self.splitter = QtWidgets.QSplitter(QtCore.Qt.Horizontal)
-
-        self.splitter.addWidget(self.ui.table_widget)
-        self.splitter.addWidget(self.graph.plot_widget)
-        self.splitter.setStretchFactor(1, 1)
-        self.splitter.setSizes([500, 150])
-        self.splitter.setStyleSheet("QSplitter::handle{"
-                                    "background-color: white;"
-                                    "border: 1px solid #D8D8D8;"
-                                    "}")
         
-        self.ui.grid.addWidget(self.splitter)
+        widget = self.graph.plot_widget
+        
+        # O gráfico entra no divisor apenas na primeira vez; depois só tem os dados atualizados
+        if self.splitter.indexOf(widget) < 0:
+            self.splitter.addWidget(widget)
+            self.splitter.setStretchFactor(1, 1)
+            self.splitter.setSizes([500, 150])
+        
+        widget.show()
     
     # Mostrar janela principal
     def ui_show(self):
@@ -0,0 +1,145 @@
+"""
+
+Módulo Cache
+
+		Cache local da hierarquia e dos catálogos entidade_bh e atributo_bh, revalidado pela base
+
+"""
+
+# Bibliotecas
+import os
+import pickle
+import hashlib
+import pandas.io.sql as sqlio
+from Tree.Hierarchy import Hierarchy, keys_query, relations_query
+from Database.Catalog import entities_query, attributes_query
+
+# Assinatura barata das tabelas guardadas no cache
+fingerprint_query = """
+	select
+		(select count(*) from chaves) as chaves,
+		(select max(bh_chave) from chaves) as max_chave,
+		(select count(*) from relacionamentos_mrid) as relacionamentos,
+		(select count(*) from entidade_bh) as entidades,
+		(select count(*) from atributo_bh) as atributos
+"""
+
+
+# Cache em disco de um servidor/base
+class HierarchyCache:
+
+	def __init__(self, directory, server, database):
+
+		key = hashlib.sha1(f'{server}/{database}'.encode()).hexdigest()[:16]
+
+		self.filename = os.path.join(directory, f'hierarquia_{key}.pkl')
+		self.fingerprint = None
+		self.keys = []
+		self.relations = []
+		self.entities = None
+		self.attributes = None
+
+	# Abre o arquivo de cache, se existir
+	def open(self):
+
+		try:
+			with open(self.filename, 'rb') as file:
+				data = pickle.load(file)
+		except (FileNotFoundError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+			return False
+
+		self.apply(data)
+
+		return True
+
+	# Passa a usar os dados recebidos (na thread principal, que é quem lê o cache)
+	def apply(self, data):
+
+		self.fingerprint = data['fingerprint']
+		self.keys = data['keys']
+		self.relations = data['relations']
+		self.entities = data['entities']
+		self.attributes = data['attributes']
+
+	# Dados atuais do cache
+	def data(self):
+		return {
+			'fingerprint': self.fingerprint,
+			'keys': self.keys,
+			'relations': self.relations,
+			'entities': self.entities,
+			'attributes': self.attributes
+		}
+
+	# Grava o cache em disco (os dados atuais, ou os dados recebidos); uma falha na gravação (disco cheio,
+	# permissão, arquivo bloqueado) não impede o uso dos dados já em memória, que voltam a ser buscados na próxima conexão
+	def save(self, data=None):
+
+		try:
+			self._write(self.data() if data is None else data)
+			return True
+		except OSError:
+			return False
+
+	def _write(self, data):
+
+		temp = self.filename + '.tmp'
+
+		with open(temp, 'wb') as file:
+			pickle.dump(data, file, pickle.HIGHEST_PROTOCOL)
+
+		os.replace(temp, self.filename)
+
+	# Assinatura atual da base
+	@staticmethod
+	def current_fingerprint(conn):
+		f = sqlio.read_sql_query(fingerprint_query, conn)
+		return tuple(str(k) for k in f.iloc[0])
+
+	# Busca todos os dados na base, sem alterar o cache
+	@classmethod
+	def read(cls, conn, fingerprint=None):
+
+		if fingerprint is None:
+			fingerprint = cls.current_fingerprint(conn)
+
+		keys = sqlio.read_sql_query(keys_query, conn)
+		relations = sqlio.read_sql_query(relations_query, conn)
+
+		return {
+			'fingerprint': fingerprint,
+			'keys': list(keys.itertuples(index=False, name=None)),
+			'relations': list(relations.itertuples(index=False, name=None)),
+			'entities': sqlio.read_sql_query(entities_query, conn),
+			'attributes': sqlio.read_sql_query(attributes_query, conn)
+		}
+
+	# Busca todos os dados na base e atualiza o arquivo
+	def fetch(self, conn):
+
+		data = self.read(conn)
+
+		self.apply(data)
+		self.save(data)
+
+	# Confere a assinatura e, se a base mudou, retorna os dados recarregados (já gravados no arquivo) ou None
+	# Executada fora da thread principal: o cache em memória não é alterado, quem chama usa apply na thread principal
+	def revalidate(self, conn):
+
+		fingerprint = self.current_fingerprint(conn)
+
+		if fingerprint == self.fingerprint:
+			return None
+
+		data = self.read(conn, fingerprint)
+		self.save(data)
+
+		return data
+
+	# Índice da hierarquia guardada, ou dos dados recebidos (montado fora da thread principal, na revalidação)
+	def hierarchy(self, data=None):
+
+		if data is None:
+			return Hierarchy(self.keys, self.relations)
+
+		return Hierarchy(data['keys'], data['relations'])
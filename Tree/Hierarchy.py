@@ -0,0 +1,139 @@
+"""
+
+Módulo Hierarchy
+
+		Índice compacto da hierarquia do SAGE, carregado uma única vez por conexão
+
+"""
+
+# Bibliotecas
+from sys import intern
+from array import array
+
+# Chaves de todos os itens (uma linha por bh_mrid)
+keys_query = """
+	select distinct on (bh_mrid) entidade, identificador, bh_mrid, indice, bh_chave
+	from chaves
+	order by bh_mrid
+"""
+
+# Relações pai-filho
+relations_query = "select distinct pai, filho from relacionamentos_mrid"
+
+
+# Registro de um item da hierarquia
+class Record:
+	__slots__ = ('entity', 'identifier', 'bh_mrid', 'index', 'bh_chave')
+
+	def __init__(self, entity, identifier, bh_mrid, index, bh_chave):
+
+		self.entity = entity
+		self.identifier = identifier
+		self.bh_mrid = bh_mrid
+		self.index = index
+		self.bh_chave = bh_chave
+
+	def __str__(self):
+		return str(self.identifier)
+
+
+# Lista de adjacência compacta (CSR): offsets[p]:offsets[p + 1] indexa os filhos de p em children
+class Hierarchy:
+
+	def __init__(self, keys, relations):
+
+		self.records = []
+		self.position = {}
+
+		for entity, identifier, bh_mrid, index, bh_chave in keys:
+
+			if bh_mrid in self.position:
+				continue
+
+			self.position[bh_mrid] = len(self.records)
+			self.records.append(Record(intern(str(entity)), intern(str(identifier)), bh_mrid, index, bh_chave))
+
+		roots = set()
+		edges = set()
+
+		for pai, filho in relations:
+
+			child = self.position.get(filho)
+
+			if child is None:
+				continue
+
+			if pai == filho:
+				roots.add(child)
+				continue
+
+			parent = self.position.get(pai)
+
+			if parent is not None:
+				edges.add((parent, child))
+
+		# Filhos ordenados por pai e, dentro de cada pai, pelo identificador
+		edges = sorted(edges, key=lambda x: (x[0], self.records[x[1]].identifier))
+
+		self.offsets = array('l', [0]) * (len(self.records) + 1)
+		self.children = array('l', [child for _, child in edges])
+		self.parents = array('l', [-1]) * len(self.records)
+
+		for parent, child in edges:
+			self.offsets[parent + 1] += 1
+
+			if self.parents[child] < 0:
+				self.parents[child] = parent
+
+		for i in range(len(self.records)):
+			self.offsets[i + 1] += self.offsets[i]
+
+		self.roots = array('l', sorted(roots, key=lambda x: self.records[x].identifier))
+
+	# Posições dos filhos de um item (bh_mrid=None retorna a raiz)
+	def _slice(self, bh_mrid):
+
+		if bh_mrid is None:
+			return self.roots
+
+		p = self.position.get(bh_mrid)
+
+		if p is None:
+			return array('l')
+
+		return self.children[self.offsets[p]:self.offsets[p + 1]]
+
+	# Registros dos filhos de um item
+	def nodes(self, bh_mrid=None):
+		return [self.records[i] for i in self._slice(bh_mrid)]
+
+	# Número de filhos de um item
+	def count(self, bh_mrid=None):
+
+		if bh_mrid is None:
+			return len(self.roots)
+
+		p = self.position.get(bh_mrid)
+
+		if p is None:
+			return 0
+
+		return self.offsets[p + 1] - self.offsets[p]
+
+	# Caminho (bh_mrid) da raiz até o item
+	def path(self, bh_mrid):
+
+		p = self.position.get(bh_mrid)
+
+		if p is None:
+			return []
+
+		path = [p]
+
+		while (self.parents[path[-1]] >= 0) and (self.parents[path[-1]] not in path):
+			path.append(self.parents[path[-1]])
+
+		return [self.records[k].bh_mrid for k in reversed(path)]
+
+	def __len__(self):
+		return len(self.records)
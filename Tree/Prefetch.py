@@ -0,0 +1,167 @@
+"""
+
+Módulo Prefetch
+
+		Busca antecipada, em segundo plano, do próximo nível do treeview
+
+"""
+
+# Bibliotecas
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import Tree.Tree as Tree
+
+
+# Guarda os níveis já buscados, indexados pelo bh_mrid do pai
+# Uma thread de trabalho só, para não tirar do Executor as conexões do pool; limit é o máximo de buscas na fila
+class Prefetcher:
+
+	def __init__(self, pool, depth=1, workers=1, size=512, limit=8):
+
+		self.pool = pool
+		self.depth = depth
+		self.size = size
+		self.limit = limit
+
+		self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='prefetch')
+		self.lock = threading.Lock()
+
+		self.levels = OrderedDict()
+		self.pending = {}
+		self.claimed = set()
+		self.generation = 0
+
+		self.hits = 0
+		self.misses = 0
+
+	# Agenda a busca dos filhos dos nódulos recém-mostrados (os primeiros da lista, até completar a fila)
+	def schedule(self, nodes, depth=None, generation=None):
+
+		if depth is None:
+			depth = self.depth
+
+		if depth <= 0:
+			return
+
+		with self.lock:
+
+			if generation is None:
+				generation = self.generation
+
+			elif generation != self.generation:
+				return
+
+			for node in nodes:
+
+				if len(self.pending) >= self.limit:
+					break
+
+				if (node.bh_mrid not in self.levels) and (node.bh_mrid not in self.pending):
+					self.pending[node.bh_mrid] = self.executor.submit(self._fetch, node, depth, generation)
+
+	# Executada nas threads de trabalho
+	def _fetch(self, node, depth, generation):
+
+		if generation != self.generation:
+			return None
+
+		try:
+			with self.pool.connection() as conn:
+				tr = Tree.TreeNode(node.entity, node.identifier, node.bh_mrid, node.index, node.bh_chave, connection=conn)
+				level = Tree.fetch_level(tr)
+		except Tree.errors:
+			level = None
+
+		with self.lock:
+
+			self.pending.pop(node.bh_mrid, None)
+
+			if (generation != self.generation) or (level is None):
+				self.claimed.discard(node.bh_mrid)
+				return None
+
+			# Nível já pedido por take: vai direto para quem espera pelo future, sem ser guardado
+			if node.bh_mrid in self.claimed:
+				self.claimed.discard(node.bh_mrid)
+			else:
+				self.levels[node.bh_mrid] = level
+
+			while len(self.levels) > self.size:
+				self.levels.popitem(last=False)
+
+		nodes, count = level
+
+		if count is not None:
+			self.schedule([k for k in nodes if count.get(k.bh_mrid, 0) > 0], depth - 1, generation)
+
+		return level
+
+	# Retorna, sem esperar, o nível já buscado de um item, o future da busca já em andamento ou None
+	# O future entrega o nível (ou None, se a busca foi descartada); quem chama decide se espera por ele
+	# Uma busca ainda na fila é cancelada: esperar por ela seria esperar também por todas as que estão antes
+	def take(self, bh_mrid):
+
+		with self.lock:
+
+			level = self.levels.pop(bh_mrid, None)
+
+			if level is not None:
+				self.hits += 1
+				return level
+
+			future = self.pending.get(bh_mrid)
+
+			if future is not None:
+
+				if future.cancel():
+					self.pending.pop(bh_mrid, None)
+					self.misses += 1
+					return None
+
+				self.hits += 1
+				self.claimed.add(bh_mrid)
+				return future
+
+			self.misses += 1
+
+		# O usuário foi para outro ramo: o que estava pendente não será mais usado
+		self.cancel()
+
+		return None
+
+	# Cancela as buscas pendentes e descarta as que estão em andamento
+	def cancel(self):
+
+		with self.lock:
+
+			self.generation += 1
+
+			for future in self.pending.values():
+				future.cancel()
+
+			self.pending.clear()
+			self.claimed.clear()
+
+	# Descarta tudo o que foi guardado
+	def clear(self):
+
+		self.cancel()
+
+		with self.lock:
+			self.levels.clear()
+
+	# Contadores de acertos e falhas
+	@property
+	def stats(self):
+
+		with self.lock:
+			total = self.hits + self.misses
+			ratio = self.hits / total if total > 0 else 0.0
+
+			return {'hits': self.hits, 'misses': self.misses, 'ratio': ratio, 'depth': self.depth}
+
+	# Encerra as threads de trabalho e libera os níveis guardados (na troca de conexão)
+	def shutdown(self):
+		self.clear()
+		self.executor.shutdown(wait=False)
@@ -0,0 +1,218 @@
+"""
+
+Módulo Search
+
+		Índice local de busca por prefixo e por trecho dos identificadores da hierarquia
+
+"""
+
+# Bibliotecas
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+import pandas.io.sql as sqlio
+
+# Identificadores de todos os itens
+keys_query = """
+	select distinct on (bh_mrid) entidade, identificador, bh_mrid, bh_chave
+	from chaves
+	order by bh_mrid
+"""
+
+# Itens incluídos depois da última atualização do índice
+new_keys_query = """
+	select distinct on (bh_mrid) entidade, identificador, bh_mrid, bh_chave
+	from chaves
+	where bh_chave > %(bh_chave)s
+	order by bh_mrid
+"""
+
+# Todos os ancestrais de um item em uma única consulta
+ancestors_query = """
+	with recursive up(filho, pai, depth) as (
+		select filho, pai, 0 from relacionamentos_mrid where filho = %(bh_mrid)s and pai <> filho
+		union
+		select r.filho, r.pai, up.depth + 1
+		from relacionamentos_mrid r
+		join up on r.filho = up.pai
+		where r.pai <> r.filho and up.depth < 64
+	)
+	select filho, pai from up order by depth
+"""
+
+# Todos os descendentes de um item em uma única consulta
+descendants_query = """
+	with recursive down(filho, depth) as (
+		select filho, 0 from relacionamentos_mrid where pai = %(bh_mrid)s and filho <> pai
+		union
+		select r.filho, down.depth + 1
+		from relacionamentos_mrid r
+		join down on r.pai = down.filho
+		where r.filho <> r.pai and down.depth < 64
+	)
+	select distinct filho from down
+"""
+
+
+# Resultado da busca
+class Match:
+	__slots__ = ('entity', 'identifier', 'bh_mrid', 'bh_chave')
+
+	def __init__(self, entity, identifier, bh_mrid, bh_chave):
+
+		self.entity = entity
+		self.identifier = identifier
+		self.bh_mrid = bh_mrid
+		self.bh_chave = bh_chave
+
+	def __str__(self):
+		return f'{str(self.identifier).strip()} ({str(self.entity).strip()})'
+
+
+# Índice de busca
+# Prefixo: lista ordenada dos identificadores em minúsculas (bisect)
+# Trecho: todos os identificadores concatenados em um único texto, separados por '\n' (str.find)
+class SearchIndex:
+
+	def __init__(self):
+
+		self.lock = threading.Lock()
+
+		self.matches = []
+		self.keys = []
+		self.corpus = '\n'
+		self.starts = array('l')
+		self.known = set()
+		self.max_chave = None
+
+	# Inclui novos itens no índice
+	def add(self, rows):
+
+		with self.lock:
+
+			parts = []
+			keys = []
+			offset = len(self.corpus)
+
+			for entity, identifier, bh_mrid, bh_chave in rows:
+
+				if bh_mrid in self.known:
+					continue
+
+				text = str(identifier).strip().lower().replace('\n', ' ')
+				position = len(self.matches)
+
+				self.known.add(bh_mrid)
+				self.matches.append(Match(entity, identifier, bh_mrid, bh_chave))
+				self.starts.append(offset)
+
+				parts.append(text)
+				keys.append((text, position))
+				offset += len(text) + 1
+
+				if (bh_chave is not None) and ((self.max_chave is None) or (bh_chave > self.max_chave)):
+					self.max_chave = bh_chave
+
+			if len(parts) == 0:
+				return 0
+
+			self.corpus += '\n'.join(parts) + '\n'
+
+			self.keys.extend(keys)
+			self.keys.sort()
+
+			return len(parts)
+
+	# Constrói o índice a partir da base
+	@classmethod
+	def load(cls, conn):
+
+		index = cls()
+		index.add(sqlio.read_sql_query(keys_query, conn).itertuples(index=False, name=None))
+
+		return index
+
+	# Constrói o índice a partir da hierarquia em memória
+	@classmethod
+	def from_hierarchy(cls, hierarchy):
+
+		index = cls()
+		index.add((k.entity, k.identifier, k.bh_mrid, k.bh_chave) for k in hierarchy.records)
+
+		return index
+
+	# Atualização incremental: busca apenas os itens com bh_chave maior que o último indexado
+	def refresh(self, conn):
+
+		if self.max_chave is None:
+			rows = sqlio.read_sql_query(keys_query, conn)
+		else:
+			rows = sqlio.read_sql_query(new_keys_query, conn, params={'bh_chave': self.max_chave})
+
+		return self.add(rows.itertuples(index=False, name=None))
+
+	# Itens cujo identificador começa com o texto e, em seguida, os que o contêm
+	def search(self, text, limit=200):
+
+		text = text.strip().lower().replace('\n', ' ')
+
+		if len(text) == 0:
+			return []
+
+		found = []
+		seen = set()
+
+		with self.lock:
+
+			i = bisect_left(self.keys, (text,))
+
+			while (i < len(self.keys)) and (len(found) < limit) and self.keys[i][0].startswith(text):
+				position = self.keys[i][1]
+				seen.add(position)
+				found.append(self.matches[position])
+				i += 1
+
+			offset = self.corpus.find(text)
+
+			while (offset >= 0) and (len(found) < limit):
+
+				position = bisect_right(self.starts, offset) - 1
+
+				if position not in seen:
+					seen.add(position)
+					found.append(self.matches[position])
+
+				# Continua a partir do próximo item
+				end = self.corpus.find('\n', offset)
+				offset = self.corpus.find(text, end + 1)
+
+		return found
+
+	def __len__(self):
+		return len(self.matches)
+
+
+# Caminho da raiz até o item, usando uma única consulta de ancestrais
+def ancestors(conn, bh_mrid):
+
+	g = sqlio.read_sql_query(ancestors_query, conn, params={'bh_mrid': bh_mrid})
+
+	parent = {}
+
+	for filho, pai in zip(g['filho'], g['pai']):
+		parent.setdefault(filho, pai)
+
+	path = [bh_mrid]
+
+	while (path[-1] in parent) and (parent[path[-1]] not in path):
+		path.append(parent[path[-1]])
+
+	return path[::-1]
+
+
+# O item e todos os seus descendentes, resolvidos na base
+def descendants(conn, bh_mrid):
+
+	g = sqlio.read_sql_query(descendants_query, conn, params={'bh_mrid': bh_mrid})
+
+	return [bh_mrid] + [k for k in g['filho'] if k != bh_mrid]
@@ -12,17 +12,45 @@ import os
 import pandas as pd
 import pandas.io.sql as sqlio
 from itertools import islice
+import Database.Prepared as Prepared
+import Database.Connect as Connect
 from PyQt5 import QtWidgets, QtCore, QtGui
-from psycopg2 import OperationalError, InterfaceError
-from sshtunnel import BaseSSHTunnelForwarderError
+from psycopg2 import OperationalError
 
 # Possíveis erros de consulta SQL
-errors = (sqlio.DatabaseError, OperationalError, BaseSSHTunnelForwarderError, ValueError, IndexError, EOFError)
+errors = (sqlio.DatabaseError, OperationalError, Connect.TunnelError, ValueError, IndexError, EOFError)
+
+# Filhos de um item junto de suas chaves, em uma única consulta
+children_query = """
+	select distinct on (c.bh_mrid) c.entidade, c.identificador, c.bh_mrid, c.indice, c.bh_chave
+	from relacionamentos_mrid r
+	join chaves c on c.bh_mrid = r.filho
+	where r.pai = %(bh_mrid)s and r.filho <> r.pai
+	order by c.bh_mrid
+"""
+
+# Número de filhos de vários itens, agrupado por pai
+count_query = """
+	select r.pai, count(distinct r.filho) as filhos
+	from relacionamentos_mrid r
+	join chaves c on c.bh_mrid = r.filho
+	where r.pai = any(%(bh_mrids)s) and r.filho <> r.pai
+	group by r.pai
+"""
+
+# Itens na raiz da hierarquia (pai = filho)
+root_query = """
+	select distinct on (c.bh_mrid) c.entidade, c.identificador, c.bh_mrid, c.indice, c.bh_chave
+	from relacionamentos_mrid r
+	join chaves c on c.bh_mrid = r.filho
+	where r.pai = r.filho
+	order by c.bh_mrid
+"""
 
 
 # Classe que define cada item do treeview
 class TreeNode:
-	def __init__(self, entity=None, identifier=None, bh_mrid=None, index=None, bh_chave=None, has_expanded='n', connection=None):
+	def __init__(self, entity=None, identifier=None, bh_mrid=None, index=None, bh_chave=None, has_expanded='n', connection=None, hierarchy=None):
 		
 		self.entity = entity
 		self.identifier = identifier
@@ -31,42 +59,36 @@ class TreeNode:
 		self.bh_chave = bh_chave
 		self.has_expanded = has_expanded
 		self.connection = connection
+		self.hierarchy = hierarchy
 	
 	# Retorna os nódulos de um item qualquer
 	@property
 	def nodes(self):
 		
+		if self.hierarchy is not None:
+			
+			for c in self.hierarchy.nodes(self._parent):
+				yield TreeNode(c.entity, c.identifier, c.bh_mrid, c.index, c.bh_chave, connection=self.connection, hierarchy=self.hierarchy)
+			
+			return
+		
 		g = pd.DataFrame([])
 		
 		try:
 		
 			if (self.bh_mrid is None) and (self.identifier is not None):
-				g = sqlio.read_sql_query("select * from relacionamentos_mrid where pai=filho", self.connection)
+				g = sqlio.read_sql_query(root_query, self.connection)
 			
 			else:
-				g = sqlio.read_sql_query("select * from relacionamentos_mrid where pai=%(bh_mrid)s", self.connection, params={'bh_mrid': self.bh_mrid})
+				g = Prepared.read(self.connection, children_query, {'bh_mrid': self.bh_mrid})
 				
-		except errors:
-			pass
-		
-		if g.empty:
-			return
+		except errors as error:
+			# Tempo limite excedido não é um nível vazio: o erro chega a quem pediu o nível
+			if Prepared.timed_out(error):
+				raise
 		
-		for node in g['filho']:
-			
-			if node == self.bh_mrid:
-				pass
-			else:
-				
-				try:
-					c = sqlio.read_sql_query("select * from chaves where bh_mrid=%(node)s", self.connection, params={'node': node})
-				except errors:
-					pass
-				
-				try:
-					yield TreeNode(c['entidade'][0], c['identificador'][0], c['bh_mrid'][0], c['indice'][0], c['bh_chave'][0], connection=self.connection)
-				except UnboundLocalError:
-					pass
+		for c in g.itertuples(index=False):
+			yield TreeNode(c.entidade, c.identificador, c.bh_mrid, c.indice, c.bh_chave, connection=self.connection)
 	
 	# Anda por todos os itens
 	# Não Implementada
@@ -81,10 +103,22 @@ class TreeNode:
 		for node in tree.nodes:
 			self._traverse(node)
 	
+	# bh_mrid usado na busca dos filhos (None para a raiz)
+	@property
+	def _parent(self):
+		
+		if (self.bh_mrid is None) and (self.identifier is not None):
+			return None
+		
+		return self.bh_mrid
+	
 	# Função que identifica se há nódulos no item
 	@property
 	def has_nodes(self):
 		
+		if self.hierarchy is not None:
+			return self.hierarchy.count(self._parent) > 0
+		
 		try:
 			next(self.nodes)
 		except StopIteration:
@@ -114,7 +148,7 @@ class TreeNode:
 
 
 # Função que adiciona um nódulo a um item
-def add_node(parent: (QtWidgets.QTreeWidgetItem, QtWidgets.QTreeWidget), child: TreeNode):
+def add_node(parent: (QtWidgets.QTreeWidgetItem, QtWidgets.QTreeWidget), child: TreeNode, has_nodes=None):
 	node = QtWidgets.QTreeWidgetItem(parent, [str(child)])
 	
 	text = node.font(0)
@@ -127,7 +161,10 @@ def add_node(parent: (QtWidgets.QTreeWidgetItem, QtWidgets.QTreeWidget), child:
 	node.setData(0, QtCore.Qt.UserRole + 3, child.index)
 	node.setData(0, QtCore.Qt.UserRole + 4, child.bh_chave)
 	
-	if child.has_nodes:
+	if has_nodes is None:
+		has_nodes = child.has_nodes
+	
+	if has_nodes:
 		node.setChildIndicatorPolicy(node.ShowIndicator)
 		node.setData(0, QtCore.Qt.UserRole + 5, child.has_expanded)
 	
@@ -135,6 +172,20 @@ def add_node(parent: (QtWidgets.QTreeWidgetItem, QtWidgets.QTreeWidget), child:
 	return node
 
 
+# Função que conta os filhos de vários nódulos irmãos em uma única consulta
+def count_nodes(nodes, conn=None):
+	
+	if len(nodes) == 0:
+		return {}
+	
+	try:
+		g = Prepared.read(conn, count_query, {'bh_mrids': [node.bh_mrid for node in nodes]})
+	except errors:
+		return None
+	
+	return dict(zip(g['pai'], g['filhos']))
+
+
 # Função que extrai os dados constituintes de um item
 def get_info(item: QtWidgets.QTreeWidgetItem):
 	
@@ -161,23 +212,51 @@ def set_tree_icon(item: QtWidgets.QTreeWidgetItem):
 	item.setIcon(0, QtGui.QIcon(icon))
 
 
-# Função que adiciona todos os nódulos existentes de um item
-def add_nodes(item: QtWidgets.QTreeWidgetItem, conn=None):
-	data = get_info(item)
-	
-	item.setData(0, QtCore.Qt.UserRole + 5, 'y')
+# Função que busca os filhos de um nódulo e quantos filhos cada um deles possui
+def fetch_level(tr: TreeNode):
 	
-	if data['has_expanded'] == 'n':
-		
-		try:
-			
-			tr = TreeNode(data['entity'], data['identifier'], data['bh_mrid'], data['index'], data['bh_chave'], connection=conn)
-			
-			for node in sorted(tr.nodes, key=lambda x: str(x)):
-				add_node(item, node)
-				
-		except InterfaceError:
-			pass
+	nodes = sorted(tr.nodes, key=lambda x: str(x))
 	
+	if tr.hierarchy is None:
+		count = count_nodes(nodes, tr.connection)
 	else:
-		pass
+		count = {node.bh_mrid: tr.hierarchy.count(node.bh_mrid) for node in nodes}
+	
+	return nodes, count
+
+
+# Função que insere um nível já buscado abaixo de um item
+# Retorna os nódulos adicionados que possuem filhos
+# Sem a contagem (count = None), todos ganham o indicador, sem consultas; ele some ao expandir um item sem filhos
+def populate(item: QtWidgets.QTreeWidgetItem, level):
+	
+	nodes, count = level
+	expandable = []
+	
+	for node in nodes:
+		if (count is None) or (count.get(node.bh_mrid, 0) > 0):
+			add_node(item, node, True)
+			expandable.append(node)
+		else:
+			add_node(item, node, False)
+	
+	# O nível do item já foi buscado: o indicador passa a depender dos filhos adicionados
+	item.setChildIndicatorPolicy(item.DontShowIndicatorWhenChildless)
+	
+	return expandable
+
+
+# Função que cria o TreeNode correspondente a um item
+def get_node(item: QtWidgets.QTreeWidgetItem, conn=None, hierarchy=None):
+	data = get_info(item)
+	return TreeNode(data['entity'], data['identifier'], data['bh_mrid'], data['index'], data['bh_chave'], connection=conn, hierarchy=hierarchy)
+
+
+# Função que retorna o filho de um item com o bh_mrid dado
+def find_child(item: QtWidgets.QTreeWidgetItem, bh_mrid):
+	
+	for i in range(item.childCount()):
+		if item.child(i).data(0, QtCore.Qt.UserRole + 2) == bh_mrid:
+			return item.child(i)
+	
+	return None
@@ -0,0 +1,95 @@
+"""
+
+Módulo Forms
+
+        Formulários da interface a partir das classes Python geradas dos arquivos .ui, que dispensam a leitura
+        do XML na abertura do programa; sem elas (ou se o .ui foi alterado depois), o .ui é lido por uic.loadUi
+
+        Geração das classes (antes de empacotar o programa):
+
+            python -m UI.Forms
+
+"""
+
+# Bibliotecas
+import os
+import sys
+import importlib
+from PyQt5 import QtWidgets
+
+
+# Caminhos
+path = os.path.dirname(os.path.abspath(sys.argv[0]))
+ui_path = path + '\\UI\\'
+module_path = os.path.dirname(os.path.abspath(__file__))
+
+# Formulários do programa
+forms = ['janela', 'conexao', 'tabela', 'graphic_options']
+
+
+# Módulo gerado do formulário, ou None se ele não existe ou é mais antigo que o .ui
+def _compiled(form):
+
+    try:
+        module = importlib.import_module(f'UI.{form}_ui')
+    except ImportError:
+        return None
+
+    # No programa empacotado o .ui pode não existir; o módulo gerado vale
+    try:
+        if os.path.getmtime(module.__file__) < os.path.getmtime(ui_path + form + '.ui'):
+            return None
+    except (OSError, TypeError):
+        pass
+
+    return module
+
+
+# Janela ou diálogo do formulário, com os mesmos atributos que uic.loadUi cria
+def load(form):
+
+    form = form.lower()
+    module = _compiled(form)
+
+    if module is None:
+        import PyQt5.uic as uic
+        return uic.loadUi(ui_path + form + '.ui')
+
+    widget = getattr(QtWidgets, module.base)()
+
+    ui = module.Form()
+    ui.setupUi(widget)
+
+    # Cada objeto nomeado vira um atributo do widget, como em loadUi
+    for name, value in vars(ui).items():
+        setattr(widget, name, value)
+
+    return widget
+
+
+# Gera {formulário}_ui.py ao lado de cada .ui
+def compile_forms():
+
+    import xml.etree.ElementTree as ElementTree
+    import PyQt5.uic as uic
+
+    for form in forms:
+
+        ui_file = os.path.join(module_path, form + '.ui')
+        root = ElementTree.parse(ui_file).getroot()
+
+        with open(os.path.join(module_path, form + '_ui.py'), 'w', encoding='utf-8') as file:
+
+            uic.compileUi(ui_file, file)
+
+            file.write(
+                f"\n\n# Widget de base e classe do formulário, usados por UI.Forms.load\n"
+                f"base = '{root.find('widget').get('class')}'\n"
+                f"Form = Ui_{root.find('class').text}\n"
+            )
+
+        print(f'{form}.ui -> {form}_ui.py')
+
+
+if __name__ == '__main__':
+    compile_forms()
@@ -0,0 +1 @@
+# UI
\ No newline at end of file
@@ -0,0 +1,270 @@
+"""
+Modo em lote do SAGE TreeView
+
+        Exporta o histórico (aba Consulta), o Filme e os alarmes sem a interface gráfica, por exemplo em tarefas
+        agendadas, usando a conexão salva pela janela principal (config.json)
+
+        Exemplos:
+
+            python batch.py consulta -i ITEM_1 ITEM_2 -a tensao corrente --inicio "2024-01-01" --fim "2024-01-02" -o pasta
+            python batch.py filme -i PAS:1234 -a tensao --pontos 2000 --agregacoes min max -o filme.parquet --unico
+            python batch.py alarmes -i ITEM_1 -a bh_dthr mensagem --descendentes -o alarmes.csv.gz --unico
+
+        Os itens são informados pelo identificador ou por entidade:bh_chave
+        Sem --unico, a saída é uma pasta com um arquivo por item; o formato segue a extensão (csv, csv.gz, parquet, ...)
+
+"""
+
+# Bibliotecas
+import os
+import re
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pandas as pd
+import pandas.io.sql as sqlio
+import psycopg2
+import Database.Connect as Connect
+import Database.Queries as Queries
+import Database.Prepared as Prepared
+import Database.Catalog as Catalog
+import Database.Compare as Compare
+import Tree.Search as Search
+import Table.Export as Export
+
+
+# Itens pelo identificador
+items_query = """
+    select distinct on (bh_mrid) entidade, identificador, bh_mrid, bh_chave
+    from chaves
+    where trim(identificador) = any(%(identifiers)s)
+    order by bh_mrid
+"""
+
+# Item por entidade e bh_chave
+key_query = """
+    select entidade, identificador, bh_mrid, bh_chave
+    from chaves
+    where (trim(entidade) = %(entity)s) and (bh_chave = %(bh_chave)s)
+    limit 1
+"""
+
+# Caracteres que não podem aparecer em nomes de arquivo
+invalid_characters = re.compile(r'[<>:"/\\|?*\s]+')
+
+
+# Argumentos da linha de comando
+def arguments(argv=None):
+
+    parser = argparse.ArgumentParser(description='Exportação em lote do SAGE TreeView, sem interface gráfica')
+
+    parser.add_argument('modo', choices=['consulta', 'filme', 'alarmes'], help='consulta a executar, como nas abas')
+    parser.add_argument('-i', '--itens', nargs='+', required=True, help='identificadores ou entidade:bh_chave')
+    parser.add_argument('-a', '--atributos', nargs='+', required=True, help='atributos (ou colunas de eve_h, nos alarmes)')
+    parser.add_argument('--inicio', required=True, help='início do intervalo (horário da base)')
+    parser.add_argument('--fim', required=True, help='fim do intervalo (horário da base)')
+    parser.add_argument('-o', '--saida', required=True, help='pasta (um arquivo por item) ou arquivo (--unico)')
+    parser.add_argument('--unico', action='store_true', help='grava todos os itens em um único arquivo')
+    parser.add_argument('--formato', default='csv', help='extensão dos arquivos por item (csv, csv.gz, parquet, ...)')
+    parser.add_argument('--ultimo-valor', action='store_true', help='no arquivo único, repete o último valor de cada coluna')
+    parser.add_argument('--paralelo', type=int, help='consultas simultâneas (padrão: tamanho do pool na configuração)')
+    parser.add_argument('--tempo-limite', type=int, help='tempo limite de cada consulta em segundos (0: sem limite)')
+    parser.add_argument('--config', default=Connect.config_file, help='arquivo de configuração da conexão')
+
+    movie = parser.add_argument_group('filme')
+    movie.add_argument('--pontos', type=int, default=1000, help='número aproximado de intervalos')
+    movie.add_argument('--granularidade', help='largura dos intervalos (por exemplo, "5 minutes"), em vez de --pontos')
+    movie.add_argument('--agregacoes', nargs='+', choices=list(Queries.aggregates), default=['avg'])
+    movie.add_argument('--preenchimento', choices=['interpolate', 'locf'], default='', help='preenchimento das lacunas')
+
+    alarm = parser.add_argument_group('alarmes')
+    alarm.add_argument('--severidades', nargs='+', help='nomes (como na aba Alarmes) ou códigos K_SEV_*')
+    alarm.add_argument('--descendentes', action='store_true', help='inclui os alarmes de todos os descendentes')
+
+    return parser.parse_args(argv)
+
+
+# Itens pedidos, na ordem da linha de comando (executada com uma conexão do pool)
+def resolve_items(conn, names):
+
+    identifiers = [k for k in names if ':' not in k]
+    found = {}
+
+    if identifiers:
+        g = sqlio.read_sql_query(items_query, conn, params={'identifiers': identifiers})
+        for row in g.itertuples(index=False):
+            found.setdefault(str(row.identificador).strip(), []).append(row)
+
+    items = []
+    seen = set()
+
+    for name in names:
+
+        if ':' in name:
+            entity, bh_chave = name.rsplit(':', 1)
+            g = sqlio.read_sql_query(key_query, conn, params={'entity': entity.strip(), 'bh_chave': int(bh_chave)})
+            rows = list(g.itertuples(index=False))
+        else:
+            rows = found.get(name, [])
+
+        if len(rows) == 0:
+            raise ValueError(f'Item não encontrado: {name}')
+
+        # O mesmo item pedido mais de uma vez (pelo identificador e por entidade:bh_chave, por exemplo) é consultado uma vez
+        for row in rows:
+            if row.bh_mrid not in seen:
+                seen.add(row.bh_mrid)
+                items.append(Search.Match(str(row.entidade).strip(), str(row.identificador).strip(), row.bh_mrid, row.bh_chave))
+
+    # Identificadores repetidos ganham a entidade no nome e, se ainda repetidos, a bh_chave: cada item tem o seu arquivo
+    # (ou as suas colunas, com --unico)
+    identifiers = pd.Series([k.identifier for k in items]).value_counts()
+    entities = pd.Series([str(k) for k in items]).value_counts()
+
+    def label(k):
+
+        if identifiers[k.identifier] == 1:
+            return k.identifier
+
+        if entities[str(k)] == 1:
+            return str(k)
+
+        return f'{k.identifier} ({k.entity}:{k.bh_chave})'
+
+    return [(k, label(k)) for k in items]
+
+
+# Consulta de um item (executada em uma das threads de trabalho)
+# Cada conexão guarda os comandos preparados: itens da mesma entidade reaproveitam o plano da consulta
+def item_query(args, conn, item, catalog=None):
+
+    start, end = pd.Timestamp(args.inicio), pd.Timestamp(args.fim)
+
+    if args.modo == 'alarmes':
+
+        params = {'mrids': [item.bh_mrid], 'start': str(start), 'end': str(end)}
+
+        if args.descendentes:
+            params['mrids'] = Search.descendants(conn, item.bh_mrid)
+
+        if args.severidades:
+            params['severities'] = [Queries.severities.get(k, k) for k in args.severidades]
+
+        query = Queries.alarm_sql(', '.join(args.atributos), Queries.alarm_where(bool(args.severidades)))
+
+        return Prepared.read(conn, query, params)
+
+    entity, attributes = Queries.validate(item.entity, [Queries.history_name(k) for k in args.atributos], catalog)
+
+    if args.modo == 'filme':
+
+        width = args.granularidade or Queries.bucket_width(start, end, args.pontos)
+        query = Queries.movie_sql(entity, attributes, args.agregacoes, args.preenchimento)
+
+        return Prepared.read(conn, query, Queries.movie_params(start, end, width, item.bh_chave))
+
+    query = Queries.consult_sql(entity, attributes)
+
+    return Prepared.read(conn, query, Queries.consult_params(item.bh_chave, start, end))
+
+
+# Consulta um item e, sem --unico, já grava o seu arquivo
+def run_item(args, pool, catalog, item, label):
+
+    with pool.connection() as conn:
+        g = item_query(args, conn, item, catalog)
+
+    if not args.unico:
+        Export.export(g, os.path.join(args.saida, f"{invalid_characters.sub('_', label)}.{args.formato.lstrip('.')}"))
+
+    return g
+
+
+# Tabela única: alarmes um abaixo do outro; históricos lado a lado, alinhados pelo tempo
+def combine(args, results):
+
+    if args.modo == 'alarmes':
+        tables = [g.assign(item=label) for label, g in results if not g.empty]
+        return pd.concat(tables, ignore_index=True) if tables else pd.DataFrame()
+
+    return Compare.join([g.set_index('tempo').add_prefix(f'{label} ') for label, g in results], args.ultimo_valor)
+
+
+def main(argv=None):
+
+    args = arguments(argv)
+
+    try:
+        config = Connect.load(args.config)
+    except FileNotFoundError:
+        print(f'Configuração não encontrada: {args.config}', file=sys.stderr)
+        return 2
+
+    workers = max(args.paralelo or config['pool_size'], 1)
+
+    if not args.unico:
+        os.makedirs(args.saida, exist_ok=True)
+
+    begin = time.perf_counter()
+
+    tunnel = None
+    pool = None
+    results = {}
+    failed = 0
+
+    try:
+
+        # Falhas de túnel, conexão, catálogo ou itens não encontrados: uma linha de erro, sem o traceback
+        try:
+
+            tunnel = Connect.tunnel(config)
+            pool = Connect.pool(config, size=workers, timeout=args.tempo_limite)
+
+            with pool.connection() as conn:
+                items = resolve_items(conn, args.itens)
+
+                # Atributos conferidos com atributo_bh antes de entrarem no texto das consultas
+                catalog = Catalog.Catalog.load(conn) if args.modo != 'alarmes' else None
+
+        except (Connect.TunnelError, psycopg2.OperationalError, sqlio.DatabaseError, ValueError) as error:
+            print(f'Falha ao preparar a exportação: {error}', file=sys.stderr)
+            return 2
+
+        # Cada thread usa uma conexão do pool; o pool tem o mesmo tamanho, então ninguém espera por conexão
+        with ThreadPoolExecutor(max_workers=workers) as threads:
+
+            futures = {threads.submit(run_item, args, pool, catalog, item, label): label for item, label in items}
+
+            for future in as_completed(futures):
+
+                label = futures[future]
+
+                try:
+                    results[label] = future.result()
+                    print(f'{label}: {len(results[label])} linhas')
+                except Exception as error:
+                    failed += 1
+                    print(f'{label}: {error}', file=sys.stderr)
+
+        if args.unico:
+            Export.export(combine(args, [(label, results[label]) for _, label in items if label in results]), args.saida)
+
+    finally:
+
+        if pool is not None:
+            pool.close()
+
+        if tunnel is not None:
+            tunnel.stop()
+
+    elapsed = time.perf_counter() - begin
+    rows = sum(len(g) for g in results.values())
+
+    print(f'{rows} linhas de {len(results)} itens em {elapsed:.1f} s ({rows / max(elapsed, 1e-9):.0f} linhas/s)')
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -14,71 +14,208 @@ Aplicativo SAGE TreeView
 
 # Bibliotecas
 import sys
-import json
 import os
+import time
+
+# Início da abertura do programa, antes das demais bibliotecas
+started = time.perf_counter()
+
+import threading
+from concurrent.futures import Future
 import psycopg2
 import psycopg2.extras
 import pandas as pd
 import pandas.io.sql as sqlio
 import Tree.Tree as Tree
+import Tree.Cache as Cache
+import Tree.Prefetch as Prefetch
+import Tree.Search as Search
+import Database.Executor as Executor
+import Database.Catalog as Catalog
+import Database.Records as Records
+import Database.Series as Series
+import Database.Compare as Compare
+import Database.Pages as Pages
+import Database.Queries as Queries
+import Database.Prepared as Prepared
+import Database.Connect as Connect
 import Table.Table as Table
-import PyQt5.uic as uic
+import UI.Forms as Forms
 from PyQt5 import QtWidgets, QtGui, QtCore
-from sshtunnel import SSHTunnelForwarder, BaseSSHTunnelForwarderError
 
 # Caminhos
 path = os.path.dirname(os.path.abspath(sys.argv[0]))
 icon_path = path + '\\Icon\\'
-save_path = os.getenv('LOCALAPPDATA') + '\\SAGE TreeView\\config'
+save_path = Connect.save_path
 os.makedirs(save_path, exist_ok=True)
 
+# Consultas transmitidas: linhas por bloco e máximo de linhas mantidas na tabela
+stream_chunk = 20000
+stream_limit = 5000000
+
+# Etapas da abertura do programa: (etapa, instante do fim)
+startup = [('início', started), ('bibliotecas', time.perf_counter())]
+
 # Possíveis erros de consulta SQL
-errors = (sqlio.DatabaseError, psycopg2.OperationalError, BaseSSHTunnelForwarderError, ValueError, IndexError, EOFError)
+errors = (sqlio.DatabaseError, psycopg2.OperationalError, Connect.TunnelError, ValueError, IndexError, EOFError)
+
+
+# Informações de um item selecionado (executada fora da thread principal)
+def selection_query(conn, entity, bh_chave):
+    
+    result = {'template': None, 'static': None, 'historied': None, 'reference': None}
+    
+    try:
+        t = Prepared.read(conn, Queries.template_query, {'entity': entity + '_r'})
+        result['template'] = str(t['descr'][0]).strip()
+    except errors:
+        pass
+    
+    try:
+        result['static'] = Prepared.read(conn, Queries.static_query, {'entity': entity})
+        result['historied'] = Prepared.read(conn, Queries.historied_query, {'entity': entity})
+    except errors:
+        result['static'] = None
+    
+    result['reference'] = reference_query(conn, entity, bh_chave)
+    
+    return result
+
+
+# Registro _r de um item (executada fora da thread principal)
+def reference_query(conn, entity, bh_chave):
+    
+    try:
+        return Prepared.read(conn, Queries.reference_sql(entity), {'bh_chave': Queries.plain(bh_chave)})
+    except errors:
+        return None
+
+
+# Nível do treeview (executada fora da thread principal)
+def level_query(conn, tr):
+    
+    tr.connection = conn
+    
+    return Tree.fetch_level(tr)
+
+
+# Caminho até um item e os níveis necessários para mostrá-lo (executada fora da thread principal)
+def path_query(conn, bh_mrid):
+    
+    path = Search.ancestors(conn, bh_mrid)
+    
+    levels = {None: Tree.fetch_level(Tree.TreeNode('sistema', 'Sistema Elétrico', connection=conn))}
+    
+    for mrid in path[:-1]:
+        levels[mrid] = Tree.fetch_level(Tree.TreeNode(bh_mrid=mrid, connection=conn))
+    
+    return path, levels
+
+
+# Parâmetros dos alarmes com o item e todos os seus descendentes
+def subtree_params(conn, params):
+    return dict(params, mrids=Search.descendants(conn, params['mrids'][0]))
+
+
+# Alarmes de um item ou, com subtree, do item e de todos os seus descendentes (executada fora da thread principal)
+def alarm_query(conn, query, params, subtree=False):
+    
+    if subtree:
+        params = subtree_params(conn, params)
+    
+    return Prepared.read(conn, query, params)
 
 
 # Classe principal
 class App(QtWidgets.QMainWindow):
     
+    # Sinal emitido quando a revalidação do cache encontra uma hierarquia nova: cache, dados recarregados, índice
+    hierarchy_refreshed = QtCore.pyqtSignal(object, object, object)
+    
+    # Sinal emitido (da thread da busca antecipada) quando termina a busca de um nível já pedido: item, future
+    level_prefetched = QtCore.pyqtSignal(object, object)
+    
     def __init__(self):
         super().__init__()
         
         # Janela principal
-        self.ui = uic.loadUi(path+'\\UI\\Janela.ui')
+        self.ui = Forms.load('janela')
         self.ui.setWindowIcon(QtGui.QIcon(icon_path+'SAGE TreeView.png'))
         
-        # Janela de conexão
-        self.ui_connection = uic.loadUi(path+'\\UI\\conexao.ui')
-        self.ui_connection.setAttribute(QtCore.Qt.WA_QuitOnClose, False)
-        self.ui_connection.setWindowIcon(QtGui.QIcon(icon_path+'conexao.png'))
+        mark('formulários')
         
-        self.table_window = Table.TableWindow()
+        # Janela de conexão e janela da tabela, criadas no primeiro uso
+        self._ui_connection = None
+        self._table_window = None
 
         # Interação com o treeview
         self.ui.treeWidget.itemClicked.connect(self.tree_selection)
         self.ui.treeWidget.itemExpanded.connect(self.add_nodes)
+        self.ui.treeWidget.itemCollapsed.connect(self.cancel_prefetch)
+        
+        # Busca de equipamentos
+        self.ui.search_edit.textChanged.connect(self.search)
+        self.ui.search_results.itemActivated.connect(self.select_match)
+        self.ui.search_results.hide()
         
         # Abrir janela de conexão
         self.ui.open_connection.triggered.connect(self.connection_window)
+        self.ui.refresh_catalog.triggered.connect(self.load_catalog)
+        self.ui.refresh_series.triggered.connect(self.refresh_series)
         
         # Botões das abas
         self.ui.consult_button.clicked.connect(self.consult)
+        self.ui.consult_export_button.clicked.connect(self.export_consult)
         self.ui.alarm_button.clicked.connect(self.alarm)
         self.ui.severity_check.clicked.connect(self.enable_severity_list)
         self.ui.movie_button.clicked.connect(self.movie)
-        
-        # Botões da janela de conexão
-        self.ui_connection.connection_test_button.clicked.connect(self.check_connection)
-        self.ui_connection.buttons.button(QtWidgets.QDialogButtonBox.Ok).clicked.connect(self.connection)
-        self.ui_connection.buttons.button(QtWidgets.QDialogButtonBox.Apply).clicked.connect(self.connection)
-        self.ui_connection.save_button.clicked.connect(self.save_configuration)
-        self.ui_connection.load_button.clicked.connect(self.load_configuration)
+        self.ui.auto_granularity.toggled.connect(self.enable_granularity)
+        self.enable_granularity(self.ui.auto_granularity.isChecked())
         
         # Inicialização de variáveis
         self.root = None
-        self.conn = None
+        self.pool = None
         self.tunnel = None
+        self.hierarchy = None
+        self.cache = None
+        self.prefetcher = None
+        self.selection_task = None
+        self.search_index = None
+        self.catalog = None
+        self.records = Records.RecordCache()
+        self.series = Series.SeriesCache(now=lambda: pd.Timestamp.now() + pd.Timedelta(hours=Queries.utc_offset))
         self.att_table = None
         
+        self.hierarchy_refreshed.connect(self.refresh_hierarchy)
+        self.level_prefetched.connect(self.prefetched_level)
+        
+        # Consultas executadas fora da thread principal
+        self.executor = Executor.Executor(lambda: self.pool)
+        self.executor.changed.connect(self.show_progress)
+        
+        # Progresso e cancelamento das consultas na barra de status
+        self.progress = QtWidgets.QProgressBar()
+        self.progress.setRange(0, 0)
+        self.progress.setMaximumWidth(150)
+        self.progress.hide()
+        
+        self.cancel_button = QtWidgets.QPushButton('Cancelar')
+        self.cancel_button.clicked.connect(self.executor.cancel_all)
+        self.cancel_button.hide()
+        
+        # Acertos da busca antecipada, para avaliar a profundidade configurada
+        self.prefetch_label = QtWidgets.QLabel()
+        self.prefetch_label.hide()
+        
+        self.ui.statusBar().addPermanentWidget(self.prefetch_label)
+        self.ui.statusBar().addPermanentWidget(self.progress)
+        self.ui.statusBar().addPermanentWidget(self.cancel_button)
+        
+        # Atualização incremental do índice de busca
+        self.search_timer = QtCore.QTimer(self)
+        self.search_timer.setInterval(5 * 60 * 1000)
+        self.search_timer.timeout.connect(self.refresh_search_index)
+        
         # Tamanho dos ícones do treeview
         self.ui.treeWidget.setIconSize(QtCore.QSize(28, 28))
         
@@ -89,6 +226,48 @@ class App(QtWidgets.QMainWindow):
         
         # Ícone da janela de conexão
         self.ui.open_connection.setIcon(QtGui.QIcon(icon_path+'conexao.png'))
+        
+        mark('janela')
+    
+    # Janela de conexão
+    @property
+    def ui_connection(self):
+        
+        if self._ui_connection is None:
+            
+            self._ui_connection = Forms.load('conexao')
+            self._ui_connection.setAttribute(QtCore.Qt.WA_QuitOnClose, False)
+            self._ui_connection.setWindowIcon(QtGui.QIcon(icon_path+'conexao.png'))
+            
+            # Botões da janela de conexão
+            self._ui_connection.connection_test_button.clicked.connect(lambda: self.check_connection(True))
+            self._ui_connection.buttons.button(QtWidgets.QDialogButtonBox.Ok).clicked.connect(self.connection)
+            self._ui_connection.buttons.button(QtWidgets.QDialogButtonBox.Apply).clicked.connect(self.connection)
+            self._ui_connection.save_button.clicked.connect(self.save_configuration)
+            self._ui_connection.load_button.clicked.connect(self.load_configuration)
+        
+        return self._ui_connection
+    
+    # Janela da tabela
+    @property
+    def table_window(self):
+        
+        if self._table_window is None:
+            self._table_window = Table.TableWindow()
+            self._table_window.executor = self.executor
+        
+        return self._table_window
+    
+    # Tempos da abertura na barra de status (e na saída padrão, com --tempos)
+    def show_startup(self):
+        
+        mark('exibição')
+        
+        report = startup_report()
+        self.ui.statusBar().showMessage(report, 15000)
+        
+        if ('--tempos' in sys.argv) and (sys.stdout is not None):
+            print(report)
     
     # Habilitar ou desabilitar lista de severidades
     def enable_severity_list(self):
@@ -98,6 +277,12 @@ class App(QtWidgets.QMainWindow):
             self.ui.severity_list.setEnabled(False)
             self.ui.severity_list.clearSelection()
     
+    # Granularidade manual só vale sem a automática
+    def enable_granularity(self, automatic: bool):
+        self.ui.granularity.setEnabled(not automatic)
+        self.ui.granularity_scale.setEnabled(not automatic)
+        self.ui.target_points.setEnabled(automatic)
+    
     # Obtem a configuração da janela de conexão
     def connection_configuration(self):
         
@@ -109,46 +294,54 @@ class App(QtWidgets.QMainWindow):
             'intermediate_port': self.ui_connection.ssh_intermediate_port.text(),
             'user': self.ui_connection.ssh_user.text(),
             'password': self.ui_connection.ssh_password.text(),
-            'file': fr'{self.ui_connection.ssh_file.text()}'
+            'file': fr'{self.ui_connection.ssh_file.text()}',
+            'hierarchy': self.ui_connection.hierarchy_check.isChecked(),
+            'prefetch_depth': self.ui_connection.prefetch_depth.value(),
+            'statement_timeout': self.ui_connection.statement_timeout.value(),
+            'pool_size': self.ui_connection.pool_size.value(),
+            'pool_idle_timeout': self.ui_connection.pool_idle_timeout.value(),
+            'pool_warm_up': self.ui_connection.pool_warm_up.value()
         }
         return config
         
     # Salva a configuração em um arquivo JSON
     def save_configuration(self):
         
-        config = self.connection_configuration()
-        
-        with open(save_path+'\\config.json', 'w+') as file:
-            json.dump(config, file, indent=4)
+        Connect.save(self.connection_configuration())
     
     # Recupera a configuração a partir do arquivo
     def load_configuration(self):
         
         try:
-            with open(save_path+'\\config.json', 'r+') as file:
-                config = json.load(file)
-                
-                self.ui_connection.ssh_remote_address.setText(config['remote_address'])
-                self.ui_connection.ssh_remote_port.setText(config['remote_port'])
-                self.ui_connection.ssh_local_address.setText(config['local_address'])
-                self.ui_connection.ssh_local_port.setText(config['local_port'])
-                self.ui_connection.ssh_intermediate_port.setText(config['intermediate_port'])
-                self.ui_connection.ssh_user.setText(config['user'])
-                self.ui_connection.ssh_password.setText(config['password'])
-                self.ui_connection.ssh_file.setText(config['file'])
+            config = Connect.load()
+            
+            self.ui_connection.ssh_remote_address.setText(config['remote_address'])
+            self.ui_connection.ssh_remote_port.setText(config['remote_port'])
+            self.ui_connection.ssh_local_address.setText(config['local_address'])
+            self.ui_connection.ssh_local_port.setText(config['local_port'])
+            self.ui_connection.ssh_intermediate_port.setText(config['intermediate_port'])
+            self.ui_connection.ssh_user.setText(config['user'])
+            self.ui_connection.ssh_password.setText(config['password'])
+            self.ui_connection.ssh_file.setText(config['file'])
+            self.ui_connection.hierarchy_check.setChecked(config['hierarchy'])
+            self.ui_connection.prefetch_depth.setValue(config['prefetch_depth'])
+            self.ui_connection.statement_timeout.setValue(config['statement_timeout'])
+            self.ui_connection.pool_size.setValue(config['pool_size'])
+            self.ui_connection.pool_idle_timeout.setValue(config['pool_idle_timeout'])
+            self.ui_connection.pool_warm_up.setValue(config['pool_warm_up'])
         
         except FileNotFoundError:
             self.info('Não encontrado', 'Não foi possível localizar o arquivo de configuração')
 
-    # Checagem de conexão
-    def check_connection(self):
+    # Checagem de conexão (ping=True testa uma conexão do pool na base)
+    def check_connection(self, ping=False):
         
         icon = 'bad'
         status = False
         
-        if (self.tunnel is not None) and (self.conn is not None):
+        if (self.tunnel is not None) and (self.pool is not None):
             
-            if self.tunnel.is_active and (self.conn.closed == 0):
+            if self.tunnel.is_active and self.pool.check(ping):
                 icon = 'ok'
                 status = True
                 
@@ -168,46 +361,321 @@ class App(QtWidgets.QMainWindow):
             config = self.connection_configuration()
             try:
                 
-                self.tunnel = SSHTunnelForwarder(
-                        (config['remote_address'], int(config['remote_port'])),
-                        ssh_username=config['user'],
-                        remote_bind_address=(config['local_address'], int(config['local_port'])),
-                        local_bind_address=('localhost', int(config['intermediate_port'])),
-                        ssh_pkey=config['file'],
-                        ssh_private_key_password=config['password']
-                )
+                self.tunnel = Connect.tunnel(config)
                 
-                self.tunnel.start()
+                if self.pool is not None:
+                    self.pool.close()
                 
-                self.conn = psycopg2.connect(
-                        dbname='bhdemo_ems_sage',
-                        user='sage',
-                        password='sage',
-                        host='localhost',
-                        port=int(config['intermediate_port'])
-                )
+                self.pool = Connect.pool(config)
+                
+                self.cache = Cache.HierarchyCache(save_path, f"{config['remote_address']}:{config['local_address']}:{config['local_port']}", Connect.database)
+                
+                # O cache local guarda a hierarquia em memória: sem a opção (ligada por padrão), ele não é usado
+                if not config['hierarchy']:
+                    self.hierarchy = None
+                
+                elif self.cache.open():
+                    # Árvore disponível de imediato, revalidada em segundo plano
+                    self.hierarchy = self.cache.hierarchy()
+                    threading.Thread(target=self.revalidate_cache, daemon=True).start()
                 
+                else:
+                    with self.pool.connection() as conn:
+                        self.cache.fetch(conn)
+                    self.hierarchy = self.cache.hierarchy()
+                
+                if self.prefetcher is not None:
+                    self.prefetcher.shutdown()
+                
+                # Com a hierarquia em memória não há o que antecipar
+                if (self.hierarchy is None) and (config['prefetch_depth'] > 0):
+                    self.prefetcher = Prefetch.Prefetcher(self.pool, config['prefetch_depth'])
+                else:
+                    self.prefetcher = None
+                
+                self.show_prefetch_stats()
+                
+                self.records.clear()
+                self.series.clear()
                 self.build_tree()
+                self.build_search_index()
+                
+                # Catálogos guardados no cache dispensam a consulta
+                if self.cache.entities is not None:
+                    self.catalog = Catalog.Catalog(self.cache.entities, self.cache.attributes)
+                else:
+                    self.load_catalog()
             
             except errors:
                 self.info('Falha na conexão', 'Tente se reconectar usando a janela de conexão ou reinicie a aplicação')
     
+    # Revalida o cache da hierarquia (executada fora da thread principal)
+    def revalidate_cache(self):
+        
+        cache = self.cache
+        
+        try:
+            with self.pool.connection() as conn:
+                data = cache.revalidate(conn)
+            
+            # Os dados novos são aplicados na thread principal, que é quem lê o cache; o índice já vai pronto
+            if data is not None:
+                self.hierarchy_refreshed.emit(cache, data, cache.hierarchy(data))
+        except (errors + (OSError,)):
+            pass
+    
+    # Troca a hierarquia pela versão recarregada da base
+    def refresh_hierarchy(self, cache, data, hierarchy):
+        
+        # Conexão refeita enquanto a revalidação era feita: os dados são de outro cache
+        if cache is not self.cache:
+            return
+        
+        self.cache.apply(data)
+        
+        if self.hierarchy is not None:
+            self.hierarchy = hierarchy
+            self.build_tree()
+            self.build_search_index()
+        
+        self.catalog = Catalog.Catalog(self.cache.entities, self.cache.attributes)
+    
+    # Carrega (ou recarrega) os catálogos entidade_bh e atributo_bh
+    def load_catalog(self):
+        
+        if self.check_connection():
+            self.executor.submit(Catalog.Catalog.load, result=self.set_catalog, error=self.failed, cancellable=False)
+    
+    def set_catalog(self, catalog):
+        self.catalog = catalog
+    
+    # Esquece as séries guardadas a partir do início do intervalo das abas: a próxima consulta as busca de novo
+    def refresh_series(self):
+        
+        start = self.ui.start_date.dateTime().toPyDateTime()
+        
+        self.series.invalidate(start)
+        self.ui.statusBar().showMessage(f'Séries guardadas descartadas a partir de {start:%d/%m/%Y %H:%M}', 5000)
+    
+    # Constrói o índice de busca em segundo plano
+    def build_search_index(self):
+        
+        self.search_index = None
+        hierarchy = self.hierarchy
+        
+        if hierarchy is None:
+            self.search_timer.start()
+            build = Search.SearchIndex.load
+        else:
+            self.search_timer.stop()
+            build = lambda conn: Search.SearchIndex.from_hierarchy(hierarchy)
+        
+        self.executor.submit(build, result=self.set_search_index, error=self.failed, cancellable=False)
+    
+    def set_search_index(self, index):
+        self.search_index = index
+        self.search(self.ui.search_edit.text())
+    
+    # Inclui no índice os itens novos da base
+    def refresh_search_index(self):
+        
+        if (self.search_index is not None) and self.check_connection():
+            self.executor.submit(lambda conn: self.search_index.refresh(conn), error=self.failed, cancellable=False)
+    
+    # Mostra os itens encontrados
+    def search(self, text):
+        
+        self.ui.search_results.clear()
+        
+        if (self.search_index is None) or (len(text.strip()) < 2):
+            self.ui.search_results.hide()
+            return
+        
+        for match in self.search_index.search(text):
+            result = QtWidgets.QListWidgetItem(str(match))
+            result.setData(QtCore.Qt.UserRole, match.bh_mrid)
+            self.ui.search_results.addItem(result)
+        
+        self.ui.search_results.setVisible(self.ui.search_results.count() > 0)
+    
+    # Expande a árvore até o item escolhido na busca
+    def select_match(self, result: QtWidgets.QListWidgetItem):
+        
+        bh_mrid = result.data(QtCore.Qt.UserRole)
+        
+        if self.hierarchy is not None:
+            self.expand_path(self.hierarchy.path(bh_mrid))
+        
+        elif self.check_connection():
+            self.executor.submit(
+                    path_query, bh_mrid,
+                    result=lambda value: self.expand_path(*value),
+                    error=self.failed,
+                    cancellable=False
+            )
+    
+    # Abre o caminho no treeview, inserindo os níveis já buscados, e seleciona o último item
+    def expand_path(self, path, levels=None):
+        
+        item = self.ui.treeWidget.topLevelItem(0)
+        
+        if item is None:
+            return
+        
+        key = None
+        
+        for bh_mrid in path:
+            
+            # Sem níveis buscados (hierarquia em memória), a expansão insere os filhos
+            if (levels is not None) and (Tree.get_info(item)['has_expanded'] == 'n'):
+                item.setData(0, QtCore.Qt.UserRole + 5, 'y')
+                self.show_level(item, levels[key])
+            
+            item.setExpanded(True)
+            
+            child = Tree.find_child(item, bh_mrid)
+            
+            if child is None:
+                break
+            
+            item = child
+            key = bh_mrid
+        
+        self.ui.treeWidget.setCurrentItem(item)
+        self.ui.treeWidget.scrollToItem(item)
+        self.tree_selection(item)
+    
     # Insere a base do treeview
     def build_tree(self):
         
         self.ui.treeWidget.clear()
-        self.root = Tree.TreeNode('sistema', 'Sistema Elétrico', connection=self.conn)
-        Tree.add_node(self.ui.treeWidget, self.root)
+        
+        with self.pool.connection() as conn:
+            self.root = Tree.TreeNode('sistema', 'Sistema Elétrico', connection=conn, hierarchy=self.hierarchy)
+            Tree.add_node(self.ui.treeWidget, self.root)
     
     # Adiciona nódulos aos items da treeview
     def add_nodes(self, item: QtWidgets.QTreeWidgetItem):
         
+        data = Tree.get_info(item)
+        
+        if data['has_expanded'] != 'n':
+            return
+        
+        item.setData(0, QtCore.Qt.UserRole + 5, 'y')
+        
+        # Hierarquia em memória: não há consulta a fazer
+        if self.hierarchy is not None:
+            self.show_level(item, Tree.fetch_level(Tree.get_node(item, hierarchy=self.hierarchy)))
+            return
+        
+        # A busca antecipada é consultada aqui, sem esperar: uma tarefa que esperasse por ela
+        # ocuparia uma conexão do pool enquanto a busca antecipada espera por outra
+        level = self.prefetcher.take(data['bh_mrid']) if self.prefetcher is not None else None
+        self.show_prefetch_stats()
+        
+        if isinstance(level, Future):
+            level.add_done_callback(lambda future: self.level_prefetched.emit(item, future))
+        
+        elif level is not None:
+            self.show_level(item, level)
+        
+        else:
+            self.query_level(item)
+    
+    # Acertos e falhas da busca antecipada na barra de status
+    def show_prefetch_stats(self):
+        
+        if self.prefetcher is None:
+            self.prefetch_label.hide()
+            return
+        
+        stats = self.prefetcher.stats
+        
+        self.prefetch_label.setText(
+                f"Busca antecipada (profundidade {stats['depth']}): "
+                f"{stats['hits']} acertos, {stats['misses']} falhas ({stats['ratio']:.0%})"
+        )
+        self.prefetch_label.show()
+    
+    # Busca um nível na base, em segundo plano
+    def query_level(self, item: QtWidgets.QTreeWidgetItem):
+        
+        self.executor.submit(
+                level_query, Tree.get_node(item),
+                result=lambda level: self.show_level(item, level),
+                error=lambda error: self.level_error(item, error),
+                cancellable=False
+        )
+    
+    # Fim da busca antecipada de um nível pedido antes de ela terminar
+    def prefetched_level(self, item: QtWidgets.QTreeWidgetItem, future):
+        
+        level = None
+        
+        if (not future.cancelled()) and (future.exception() is None):
+            level = future.result()
+        
         try:
-            Tree.add_nodes(item, self.conn)
-        except errors:
-            if not self.check_connection():
-                self.tunnel.stop()
-                self.connection()
+            if level is None:
+                # Busca descartada ou com erro: o nível é buscado diretamente
+                self.query_level(item)
+            else:
+                self.show_level(item, level)
+        except RuntimeError:
+            # Item removido enquanto a busca era feita
+            pass
+    
+    # Mostra um nível buscado em segundo plano
+    def show_level(self, item: QtWidgets.QTreeWidgetItem, level):
+        
+        try:
+            expandable = Tree.populate(item, level)
+        except RuntimeError:
+            # Item removido enquanto a consulta era feita
+            return
+        
+        if self.prefetcher is not None:
+            self.prefetcher.schedule(expandable)
+        
+        self.fetch_records(level[0])
+    
+    # Busca em lote os registros _r dos itens de um nível, uma consulta por entidade
+    # Apenas entidades com tabela _r no catálogo: as demais custariam uma consulta com erro a cada expansão
+    # (sem o catálogo, o registro é buscado ao selecionar o item)
+    def fetch_records(self, nodes):
+        
+        if self.catalog is None:
+            return
+        
+        groups = {}
+        
+        for node in nodes:
+            if ((node.entity, node.bh_chave) not in self.records) and self.catalog.has_reference(node.entity):
+                groups.setdefault(node.entity, []).append(node.bh_chave)
+        
+        for entity, keys in groups.items():
+            self.executor.submit(self.records.fetch, entity, keys, cancellable=False)
+    
+    # Falha ao buscar um nível: permite tentar de novo e verifica a conexão
+    def level_error(self, item: QtWidgets.QTreeWidgetItem, error):
+        
+        self.failed(error)
+        
+        try:
+            item.setData(0, QtCore.Qt.UserRole + 5, 'n')
+        except RuntimeError:
+            pass
+        
+        if not self.check_connection():
+            self.tunnel.stop()
+            self.connection()
+    
+    # Interrompe a busca antecipada quando o usuário recolhe um item
+    def cancel_prefetch(self, item: QtWidgets.QTreeWidgetItem):
+        
+        if self.prefetcher is not None:
+            self.prefetcher.cancel()
     
     # Função ativada ao selecionar um item qualquer
     def tree_selection(self, item: QtWidgets.QTreeWidgetItem):
@@ -221,35 +689,68 @@ class App(QtWidgets.QMainWindow):
             bh_chave = data['bh_chave']
     
             self.ui.general_name.setText(name)
-
-            try:
-                t = sqlio.read_sql_query("select * from entidade_bh where nome=%(entity)s", self.conn, params={'entity': entity+'_r'})
-                template = str(t['descr'][0]).strip()
-                self.ui.general_template.setText(template)
-            except errors:
-                self.ui.general_template.clear()
             
-            g = pd.DataFrame()
+            # Só interessa o resultado do último item clicado
+            if self.selection_task is not None:
+                self.selection_task.cancel()
             
-            try:
+            if self.catalog is not None:
                 
-                g = sqlio.read_sql_query(f'select * from atributo_bh where ent in (select nome from entidade_bh where entbd=%(entity)s and esqgrv=\'\')', self.conn, params={'entity': entity})
-                h = sqlio.read_sql_query(f'select * from atributo_bh where ent in (select nome from entidade_bh where entbd=%(entity)s and esqgrv<>\'\')', self.conn, params={'entity': entity})
-                self.tab_consult(g, h)
-            
-            except errors:
-                pass
+                # Catálogo em memória: apenas o registro _r vai à base, quando já não foi buscado
+                result = self.catalog.selection(entity)
+                self.show_metadata(result)
+                
+                reference = self.records.get(entity, bh_chave)
+                
+                if reference is not None:
+                    self.selection_task = None
+                    self.show_reference(name, result['static'], reference)
+                
+                else:
+                    self.selection_task = self.executor.submit(
+                            reference_query, entity, bh_chave,
+                            result=lambda reference: self.show_reference(name, result['static'], reference)
+                    )
             
-            try:
-                query = f"select * from {entity}_r where bh_chave={bh_chave}"
-                m = sqlio.read_sql_query(query, self.conn)
-                self.tab_general(g, m)
-            except errors:
-                self.ui.general_description.setText(name)
+            else:
+                
+                self.selection_task = self.executor.submit(
+                        selection_query, entity, bh_chave,
+                        result=lambda result: self.show_selection(name, result)
+                )
         
         else:
             self.connection()
     
+    # Preenche as abas com as informações do item selecionado
+    def show_selection(self, name, result):
+        
+        self.show_metadata(result)
+        
+        g = pd.DataFrame() if result['static'] is None else result['static']
+        self.show_reference(name, g, result['reference'])
+    
+    # Modelo e atributos da entidade
+    def show_metadata(self, result):
+        
+        if result['template'] is None:
+            self.ui.general_template.clear()
+        else:
+            self.ui.general_template.setText(result['template'])
+        
+        if result['static'] is not None:
+            self.tab_consult(result['static'], result['historied'])
+    
+    # Valores do registro _r na aba Geral
+    def show_reference(self, name, static, reference):
+        
+        try:
+            if reference is None:
+                raise ValueError
+            self.tab_general(static, reference)
+        except errors:
+            self.ui.general_description.setText(name)
+    
     # Consultar: aba Consulta
     def consult(self):
         
@@ -267,39 +768,16 @@ class App(QtWidgets.QMainWindow):
             
             entity = data['entity']
             bh_chave = data['bh_chave']
-
-            g = pd.DataFrame()
             
             if len(historied) > 0:
                 
                 self.table_window.allow_menubar(True)
                 self.table_window.clear_plot()
                 
-                att_hist = 'bh_dthr as tempo'
-                
-                for att in historied:
-                    
-                    att = att.text().strip()
-                    
-                    if att == 'a1_flags':
-                        att = 'flag'
-                    elif att == 'a2_flags':
-                        att = 'flagest'
-                    elif att == 'estad':
-                        att = 'estado'
-                    elif att == 'Isupa':
-                        att = 'Isa'
-                    
-                    att_hist += ',' + att
+                att_hist = self.historied_attributes()
     
                 start = self.ui.start_date.dateTime().toPyDateTime()
                 end = self.ui.end_date.dateTime().toPyDateTime()
-                
-                try:
-                    query = f"select {att_hist} from {entity}_h where ((bh_chave={bh_chave}) and (bh_dthr between \'{start}\' and \'{end}\')) order by tempo"
-                    g = sqlio.read_sql_query(query, self.conn)
-                except errors:
-                    pass
             
             try:
     
@@ -315,35 +793,238 @@ class App(QtWidgets.QMainWindow):
             except AttributeError:
                 
                 h = pd.DataFrame()
-        
-            table = pd.concat((g, h), axis=1)
-            table.ffill(0, True)
             
-            if table.empty:
-                self.info('Tabela Vazia', 'A pesquisa retornou dados vazios')
-
-            self.table_window.set_data(table)
-            self.table_window.ui_show()
+            if len(historied) == 0:
+                self.show_consult(pd.DataFrame(), h)
+            
+            # Vários itens: uma consulta por entidade e uma coluna por item e atributo
+            elif len(self.ui.treeWidget.selectedItems()) > 1:
+                self.compare(
+                        lambda entity, keys, atts: (Queries.history_sql(entity, atts), Queries.history_params(keys, start, end)),
+                        att_hist, True
+                )
+            
+            # Nomes conferidos com o catálogo antes de entrarem no texto da consulta
+            elif not self.validated(entity, att_hist):
+                return
+            
+            # Navegação por páginas: apenas as páginas visíveis são buscadas
+            elif self.ui.consult_paged.isChecked():
+                
+                pager = Pages.Pager(
+                        f"bh_dthr as tempo,{','.join(Queries.names(att_hist))}", f'{Queries.name(entity)}_h',
+                        '(bh_chave = %(bh_chave)s) and (bh_dthr between %(start)s and %(end)s)',
+                        Queries.consult_params(bh_chave, start, end),
+                        constants={k: h[k][0] for k in h.columns}
+                )
+                
+                self.table_window.start_paging(pager, start)
+                self.table_window.ui_show()
+            
+            elif self.ui.consult_stream.isChecked():
+                self.stream_consult(Queries.consult_sql(entity, att_hist), Queries.consult_params(bh_chave, start, end), h)
+            
+            # Apenas os trechos ainda não guardados no cache local são buscados na base
+            else:
+                self.executor.submit(
+                        self.series.read, entity, bh_chave, att_hist, start, end,
+                        result=lambda g: self.show_consult(g, h),
+                        error=lambda error: self.show_consult(self.failed(error), h)
+                )
         
         else:
             self.connection()
     
+    # Atributos históricos selecionados na aba Consulta, com os nomes da tabela histórica
+    def historied_attributes(self):
+        
+        att_hist = []
+        
+        for att in self.ui.consult_historied_attributes.selectedItems():
+            att = att.text().strip()
+            att_hist.append(Queries.history_name(att))
+        
+        return att_hist
+    
+    # Exportar diretamente: aba Consulta
+    # O resultado vai da base para o arquivo por COPY, sem passar por uma tabela em memória
+    def export_consult(self):
+        
+        if not self.check_connection():
+            self.connection()
+            return
+        
+        att_hist = self.historied_attributes()
+        
+        if len(att_hist) == 0:
+            self.info('Exportação', 'Selecione os atributos históricos a exportar')
+            return
+        
+        try:
+            item = self.ui.treeWidget.selectedItems()[0]
+        except IndexError:
+            item = QtWidgets.QTreeWidgetItem()
+        
+        data = Tree.get_info(item)
+        
+        if not self.validated(data['entity'], att_hist):
+            return
+        
+        start = self.ui.start_date.dateTime().toPyDateTime()
+        end = self.ui.end_date.dateTime().toPyDateTime()
+        
+        # O nome escolhido na janela da tabela, se ela já foi aberta; ela não é criada só por isso
+        if self._table_window is not None:
+            suggestion = self._table_window.ui.table_filename.text()
+        else:
+            suggestion = Table.default_filename()
+        
+        filename, _ = QtWidgets.QFileDialog.getSaveFileName(
+                self.ui, 'Exportar consulta', suggestion,
+                'CSV comprimido (*.csv.gz);;CSV (*.csv)'
+        )
+        
+        if not filename:
+            return
+        
+        self.executor.submit(
+                Executor.copy_sql, Queries.consult_sql(data['entity'], att_hist), Queries.consult_params(data['bh_chave'], start, end),
+                filename,
+                progress=self.show_export_progress,
+                result=lambda result: self.export_finished(filename, result),
+                error=self.export_failed
+        )
+    
+    # Bytes e linhas já gravados
+    def show_export_progress(self, progress):
+        size, rows = progress
+        self.ui.statusBar().showMessage(f'Exportando: {size / 2 ** 20:.1f} MB, {rows} linhas')
+    
+    def export_finished(self, filename, result):
+        size, rows = result
+        self.ui.statusBar().showMessage(f'Exportação concluída: {rows} linhas, {size / 2 ** 20:.1f} MB em {filename}', 10000)
+    
+    def export_failed(self, error):
+        
+        self.ui.statusBar().clearMessage()
+        
+        if isinstance(error, OSError):
+            self.info('Exportação', str(error))
+        else:
+            self.failed(error)
+    
+    # Entidade e atributos conferidos com o catálogo atributo_bh; False (com um aviso) se algum não existir
+    def validated(self, entity, attributes):
+        
+        try:
+            Queries.validate(entity, attributes, self.catalog)
+        except ValueError as error:
+            self.info('Consulta inválida', str(error))
+            return False
+        
+        return True
+    
+    # Itens selecionados agrupados por entidade: {entidade: ({bh_chave: identificador}, atributos da entidade)}
+    def selection_groups(self, attributes):
+        
+        groups = {}
+        
+        for item in self.ui.treeWidget.selectedItems():
+            
+            data = Tree.get_info(item)
+            
+            if (data['entity'] is None) or (data['bh_chave'] is None):
+                continue
+            
+            entity = str(data['entity']).strip()
+            
+            if entity not in groups:
+                groups[entity] = ({}, self.entity_attributes(entity, attributes))
+            
+            groups[entity][0][data['bh_chave']] = str(data['identifier']).strip()
+        
+        return {k: v for k, v in groups.items() if len(v[1]) > 0}
+    
+    # Atributos históricos que a entidade possui (todos, se o catálogo não estiver carregado)
+    def entity_attributes(self, entity, attributes):
+        
+        if self.catalog is None:
+            return list(attributes)
+        
+        names = self.catalog.history_names(entity)
+        
+        return [k for k in attributes if k in names]
+    
+    # Histórico de vários itens em uma tabela larga
+    # request(entidade, bh_chaves, atributos) retorna a consulta da entidade e seus parâmetros
+    def compare(self, request, attributes, asof):
+        
+        requests = []
+        
+        try:
+            for entity, (labels, atts) in self.selection_groups(attributes).items():
+                requests.append((*request(entity, list(labels), atts), labels))
+        except ValueError as error:
+            self.info('Consulta inválida', str(error))
+            return
+        
+        self.executor.submit(
+                Compare.collect, requests, asof,
+                result=self.show_compare,
+                error=lambda error: self.show_compare(self.failed(error))
+        )
+    
+    # Mostra a tabela larga
+    def show_compare(self, g):
+        
+        self.table_window.allow_menubar(True)
+        self.table_window.clear_plot()
+        
+        self.show_consult(g, pd.DataFrame())
+    
+    # Consulta transmitida: as linhas aparecem na tabela à medida que chegam do servidor
+    def stream_consult(self, query, params, h):
+        
+        # Atributos estáticos repetidos em todas as linhas, como no preenchimento da consulta completa
+        static = {k: h[k][0] for k in h.columns}
+        
+        task = self.executor.submit(
+                Executor.stream_sql, query, params, stream_chunk, stream_limit,
+                progress=lambda chunk: self.table_window.append_data(chunk.assign(**static)),
+                result=self.stream_finished,
+                error=self.failed,
+                finished=lambda: self.table_window.end_stream(task)
+        )
+        
+        self.table_window.start_stream(task)
+        self.table_window.ui_show()
+    
+    # Fim da consulta transmitida
+    def stream_finished(self, rows):
+        
+        if rows == 0:
+            self.info('Tabela Vazia', 'A pesquisa retornou dados vazios')
+        
+        elif rows >= stream_limit:
+            self.info('Limite de linhas', f'Foram mostradas as primeiras {stream_limit} linhas da consulta')
+    
+    # Mostra o resultado da aba Consulta
+    def show_consult(self, g, h):
+        
+        table = pd.concat((g, h), axis=1)
+        table.ffill(0, True)
+        
+        if table.empty:
+            self.info('Tabela Vazia', 'A pesquisa retornou dados vazios')
+
+        self.table_window.set_data(table)
+        self.table_window.ui_show()
+    
     # Consultar: aba Alarmes
     def alarm(self):
         
         if self.check_connection():
             
-            g = pd.DataFrame()
-            
-            severity_dict = {
-                'Advertência': 'K_SEV_ADVER',
-                'Fatal': 'K_SEV_FATAL',
-                'Normal': 'K_SEV_NORML',
-                'Pânico': 'K_SEV_PANIC',
-                'Nula': 'K_SEV_SNULA',
-                'Urgência': 'K_SEV_URGEN'
-            }
-            
             sev_check = self.ui.severity_check.isChecked()
             
             alarm_list = self.ui.alarm_list.selectedItems()
@@ -366,36 +1047,54 @@ class App(QtWidgets.QMainWindow):
                 alrm += item + ','
             alrm = alrm.rstrip(',')
             
+            try:
+                alrm = ', '.join(Queries.names(alrm.split(',')))
+            except ValueError:
+                self.info('Alarmes', 'Selecione as colunas dos alarmes')
+                return
+            
+            params = {'mrids': [bh_mrid], 'start': str(start), 'end': str(end)}
+            
+            where = Queries.alarm_where(sev_check)
+            
             if sev_check:
                 
                 severity_list = self.ui.severity_list.selectedItems()
                 
-                sev = ''
-                
-                for item in severity_list:
-                    item = item.text().strip()
-                    item = severity_dict[item]
-                    sev += f'severidade=\'{item}\' or '
-                sev = sev.rstrip(' or ')
-                
-                query = f'select {alrm} from eve_h where ((mrid=\'{bh_mrid}\') and (bh_dthr between \'{start}\' and \'{end}\') and ({sev})) order by bh_dthr'
+                params['severities'] = [Queries.severities[k.text().strip()] for k in severity_list]
             
-            else:
+            if self.ui.alarm_paged.isChecked():
                 
-                query = f'select {alrm} from eve_h where ((mrid=\'{bh_mrid}\') and (bh_dthr between \'{start}\' and \'{end}\')) order by bh_dthr'
+                pager = Pages.Pager(
+                        alrm, 'eve_h', where, params,
+                        resolve=subtree_params if self.ui.alarm_subtree.isChecked() else None,
+                        keys=('mrid',),
+                        ties=True
+                )
                 
-            try:
-                g = sqlio.read_sql_query(query, self.conn)
-            except errors:
-                pass
+                self.table_window.clear_plot()
+                self.table_window.start_paging(pager, start)
+                self.table_window.ui_show()
+                return
+            
+            query = Queries.alarm_sql(alrm, where)
             
-            self.table_window.clear_plot()
-            self.table_window.set_data(g)
-            self.table_window.ui_show()
+            self.executor.submit(
+                    alarm_query, query, params, self.ui.alarm_subtree.isChecked(),
+                    result=self.show_alarm,
+                    error=lambda error: self.show_alarm(self.failed(error))
+            )
             
         else:
             self.connection()
     
+    # Mostra o resultado da aba Alarmes
+    def show_alarm(self, g):
+        
+        self.table_window.clear_plot()
+        self.table_window.set_data(g)
+        self.table_window.ui_show()
+    
     # Consultar: aba Filme
     def movie(self):
         
@@ -419,53 +1118,95 @@ class App(QtWidgets.QMainWindow):
                 
                 att = att.text().strip()
                 
-                if att == 'a1_flags':
-                    att = 'flag'
-                elif att == 'a2_flags':
-                    att = 'flagest'
-                elif att == 'estad':
-                    att = 'estado'
-                elif att == 'Isupa':
-                    att = 'Isa'
-                
-                att_hist.append(att)
+                att_hist.append(Queries.history_name(att))
 
-            columns = ','.join([f'avg({k}) as {k}' for k in att_hist])
+            functions = [k for k, check in (
+                    ('min', self.ui.aggregate_min),
+                    ('max', self.ui.aggregate_max),
+                    ('avg', self.ui.aggregate_avg),
+                    ('last', self.ui.aggregate_last)
+            ) if check.isChecked()]
+            
+            if len(functions) == 0:
+                functions = ['avg']
             
             start = self.ui.start_date.dateTime().toPyDateTime()
             end = self.ui.end_date.dateTime().toPyDateTime()
             
-            time_step = self.ui.granularity.text()
-            time_scale = self.ui.granularity_scale.currentData(0)
+            if self.ui.auto_granularity.isChecked():
+                
+                width = Queries.bucket_width(start, end, self.ui.target_points.value())
             
-            time_scale_dict = {
-                'segundo(s)': 'seconds',
-                'minuto(s)': 'minutes',
-                'hora(s)': 'hours',
-                'dia(s)': 'days'
-            }
+            else:
+                
+                time_step = self.ui.granularity.text()
+                time_scale = self.ui.granularity_scale.currentData(0)
+                
+                time_scale_dict = {
+                    'segundo(s)': 'seconds',
+                    'minuto(s)': 'minutes',
+                    'hora(s)': 'hours',
+                    'dia(s)': 'days'
+                }
+                
+                width = f'{time_step} {time_scale_dict[time_scale]}'
             
-            time_scale = time_scale_dict[time_scale]
+            fill = Queries.gapfills[self.ui.gapfill.currentIndex()]
             
-            g = pd.DataFrame()
+            # Vários itens: os intervalos já são comuns a todos, sem alinhamento pelo último valor
+            if len(self.ui.treeWidget.selectedItems()) > 1:
+                self.compare(
+                        lambda entity, keys, atts: (Queries.movie_sql(entity, atts, functions, fill, True),
+                                                    Queries.movie_params(start, end, width, keys)),
+                        att_hist, False
+                )
+                return
             
-            query = f'select time_bucket_gapfill(\'{time_step} {time_scale}\', bh_dthr) as tempo,{columns} from {entity}_h where ((bh_dthr between \'{start}\' and \'{end}\') and (bh_chave={bh_chave})) group by tempo order by tempo'
+            if not self.validated(entity, att_hist):
+                return
             
-            try:
-                g = sqlio.read_sql_query(query, self.conn)
-                g['tempo'] = g['tempo'] - pd.DateOffset(hours=3)
-                
-            except errors:
-                pass
-
-            self.table_window.allow_menubar(True)
-            self.table_window.clear_plot()
-            self.table_window.set_data(g)
-            self.table_window.ui_show()
+            query = Queries.movie_sql(entity, att_hist, functions, fill)
+            
+            self.executor.submit(
+                    Executor.read_sql, query, Queries.movie_params(start, end, width, bh_chave),
+                    result=self.show_movie,
+                    error=lambda error: self.show_movie(self.failed(error))
+            )
             
         else:
             self.connection()
     
+    # Mostra o resultado da aba Filme
+    def show_movie(self, g):
+
+        self.table_window.allow_menubar(True)
+        self.table_window.clear_plot()
+        self.table_window.set_data(g)
+        self.table_window.ui_show()
+    
+    # Consulta que falhou: a tabela fica vazia e o tempo limite excedido é informado
+    # Erros inesperados também são informados (relançá-los dentro de um slot do Qt encerraria o programa)
+    def failed(self, error):
+        
+        if Prepared.timed_out(error):
+            self.info('Consulta interrompida', 'A consulta excedeu o tempo limite definido na janela de conexão')
+        
+        elif not isinstance(error, errors):
+            self.info('Falha na consulta', f'{type(error).__name__}: {error}')
+        
+        return pd.DataFrame()
+    
+    # Mostra as consultas em andamento na barra de status
+    def show_progress(self, running: int):
+        
+        self.progress.setVisible(running > 0)
+        self.cancel_button.setVisible(running > 0)
+        
+        if running > 0:
+            self.ui.statusBar().showMessage(f'{running} consulta(s) em andamento')
+        else:
+            self.ui.statusBar().clearMessage()
+    
     # Aba Consulta
     def tab_consult(self, static, historied):
 
@@ -538,16 +1279,34 @@ class App(QtWidgets.QMainWindow):
         sys.__excepthook__(cls, exception, traceback)
 
 
+# Fim de uma etapa da abertura
+def mark(step):
+    startup.append((step, time.perf_counter()))
+
+
+# Duração total e de cada etapa da abertura
+def startup_report():
+    
+    steps = ', '.join(f'{step} {end - begin:.2f} s' for (_, begin), (step, end) in zip(startup, startup[1:]))
+    
+    return f'Aberto em {startup[-1][1] - startup[0][1]:.2f} s ({steps})'
+
+
 app = None
 
 
 def main():
     global app
     app = QtWidgets.QApplication(sys.argv)
+    mark('aplicação')
     p = App()
     app.setStyle('fusion')
     p.ui_show()
     sys.excepthook = p.except_hook
+    
+    # Executado na primeira volta do laço de eventos, com a janela já desenhada
+    QtCore.QTimer.singleShot(0, p.show_startup)
+    
     app.exec()
 
 